@@ -1,10 +1,31 @@
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from gensim.models import Word2Vec
 import numpy as np
+import asyncio
+import bisect
+import hashlib
+import hmac
 import json
+import logging
+import os
 import random
-from fastapi import FastAPI
+import re
+import signal
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+# passe avant NumPy partagée avec l'export (modele/export.py vérifie qu'elle reproduit Keras)
+# et ordre du draft de prepare_data
+sys.path.append(str(Path(__file__).resolve().parent.parent / "modele"))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "collect_process_data"))
+from export import numpy_forward
+from draft_order import DRAFT_ORDERS, FIRST_PICK_SLOTS
 
 
 def load_hero_names(json_file="heroes.json"):
@@ -26,78 +47,1384 @@ def get_hero_name(hero_code, hero_dict):
     '''
     return hero_dict.get(hero_code, hero_code)
 
-def transform_draft_to_vectors_padded(draft_sequence, word2vec_model, maxlen=10):
+def fold_name(name):
+    '''
+    Normalise un nom de héros pour la recherche : accents retirés, casse ignorée,
+    ponctuation remplacée par des espaces ("Ravi" == "ravi", "Ainos 2.0" == "ainos 2 0").
+    param name: nom à normaliser
+    return: nom normalisé
+    '''
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).casefold()
+    return " ".join(re.findall(r"\w+", name))
+
+class HeroNameIndex:
+    '''
+    Index des noms des héros, construit une fois au chargement de heroes.json.
+    Le dictionnaire inverse répond à /get_codes/ en O(1) ; le tableau trié des noms normalisés,
+    et de chacun de leurs suffixes commençant par un mot, répond aux préfixes par recherche dichotomique.
+    param hero_dict: dictionnaire mappant les codes des héros à leurs noms
+    '''
+
+    def __init__(self, hero_dict):
+        self.codes_by_name = {}
+        entries = []
+        for code, name in hero_dict.items():
+            folded = fold_name(name)
+            self.codes_by_name.setdefault(folded, []).append(code)
+            words = folded.split(" ")
+            for position in range(len(words)):
+                entries.append((" ".join(words[position:]), position, len(folded), name, code))
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    def codes(self, hero_name):
+        return self.codes_by_name.get(fold_name(hero_name), [])
+
+    def search(self, query, limit=10):
+        '''
+        Recherche les héros dont le nom, ou un mot du nom, commence par la requête.
+        Classement : nom exact, puis début du nom, puis début d'un mot ; à égalité le nom le plus court.
+        param query: début du nom saisi
+        param limit: nombre maximal de résultats
+        return: liste de dictionnaires {"hero_code", "hero_name"}
+        '''
+        query = fold_name(query)
+        if not query:
+            return []
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + "\uffff", start)
+        best = {}
+        for key, position, length, name, code in self.entries[start:end]:
+            rank = (0 if key == query and position == 0 else 1 if position == 0 else 2, length, name)
+            if code not in best or rank < best[code]:
+                best[code] = rank
+        ranked = sorted(best.items(), key=lambda item: (item[1], item[0]))[:limit]
+        return [{"hero_code": code, "hero_name": rank[2]} for code, rank in ranked]
+
+def transform_draft_to_vectors_padded(draft_sequence, hero_index, maxlen=10):
     '''
     Transforme une séquence de codes de héros en une séquence de vecteurs Word2Vec, puis la remplit pour atteindre une longueur fixe.
     param draft_sequence: liste des codes des héros dans le draft
-    param word2vec_model: modèle Word2Vec pré-entraîné
+    param hero_index: index des héros (HeroIndex) contenant les vecteurs Word2Vec
     param maxlen: longueur maximale de la séquence après remplissage
-    return: séquence de vecteurs remplie
+    return: séquence de vecteurs remplie (1, maxlen, dim), à gauche comme pad_sequences
     '''
-    draft_vectors = [word2vec_model.wv[code] for code in draft_sequence]
-    draft_padded = pad_sequences([draft_vectors], maxlen=maxlen, padding='pre', dtype='float32')
+    rows = [hero_index.key_to_index[code] for code in draft_sequence][-maxlen:]
+    draft_padded = np.zeros((1, maxlen, hero_index.vectors.shape[1]), dtype=np.float32)
+    if rows:
+        draft_padded[0, maxlen - len(rows):] = hero_index.vectors[rows]
     return draft_padded
 
-def choose_top_heroes(draaft_padded, model, word2vec_model, topn=5):
+def choose_top_heroes(draaft_padded, model, hero_index, topn=5, excluded=None):
     '''
     Prédit le prochain héros à choisir en utilisant le modèle et retourne les héros les plus similaires.
     param draaft_padded: séquence de vecteurs remplie représentant le draft actuel
     param model: modèle Keras pré-entraîné pour la prédiction
-    param word2vec_model: modèle Word2Vec pré-entraîné
+    param hero_index: index de similarité des héros (HeroIndex)
     param topn: nombre de héros similaires à retourner
+    param excluded: masque des héros à ne pas recommander (déjà pickés ou bannis)
     return: liste des héros les plus similaires au vecteur prédit
     '''
     prediction = model.predict(draaft_padded)
     predicted_vector = prediction[0]
-    closest_heroes = word2vec_model.wv.similar_by_vector(predicted_vector, topn=topn)
-    return random.choices(closest_heroes, k=1)
+    return hero_index.top_k(predicted_vector, k=topn, excluded=excluded)
+
+
+class HeroIndex:
+    '''
+    Index de similarité des héros construit une seule fois au chargement des artefacts.
+    Les embeddings sont normalisés en float32 : le top-k d'un batch de vecteurs prédits
+    coûte un produit matriciel et un argpartition, sans reparcourir le vocabulaire Word2Vec.
+    param codes: codes des héros, dans l'ordre des lignes de vectors
+    param vectors: embeddings des héros (n_heroes, dim)
+    param hero_dict: dictionnaire mappant les codes des héros à leurs noms
+    '''
+
+    def __init__(self, codes, vectors, hero_dict):
+        self.codes = list(codes)
+        self.key_to_index = {code: i for i, code in enumerate(self.codes)}
+        self.names = [get_hero_name(code, hero_dict) for code in self.codes]
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.normed = self.vectors / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def from_word2vec(cls, word2vec_model, hero_dict):
+        wv = word2vec_model.wv
+        return cls(wv.index_to_key, wv.vectors, hero_dict)
+
+    @classmethod
+    def from_artifact(cls, artifact, hero_dict):
+        return cls(artifact["hero_codes"].tolist(), artifact["hero_vectors"], hero_dict)
+
+    def mask(self, codes):
+        '''
+        Construit le masque des héros à exclure du classement.
+        param codes: codes des héros déjà pickés ou bannis (les codes inconnus sont ignorés)
+        return: tableau booléen (n_heroes,)
+        '''
+        excluded = np.zeros(len(self.codes), dtype=bool)
+        rows = [self.key_to_index[code] for code in codes if code in self.key_to_index]
+        excluded[rows] = True
+        return excluded
+
+    def scores(self, predicted_vectors, excluded=None):
+        '''
+        Similarité cosinus entre un batch de vecteurs prédits et tous les héros.
+        param predicted_vectors: batch de vecteurs (batch, dim)
+        param excluded: masque (n_heroes,) ou (batch, n_heroes) des héros à exclure (score -inf)
+        return: tableau (batch, n_heroes)
+        '''
+        vectors = np.atleast_2d(np.asarray(predicted_vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (vectors / np.maximum(norms, 1e-12)) @ self.normed.T
+        if excluded is not None:
+            scores = np.where(excluded, -np.inf, scores)
+        return scores
+
+    def rank(self, scores, k=5):
+        '''
+        Garde les k meilleurs héros de chaque ligne de scores (argpartition puis tri des k seulement).
+        param scores: tableau (batch, n_heroes), -inf pour les héros exclus
+        param k: nombre de héros à retourner par ligne
+        return: une liste de (code, score) par ligne
+        '''
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(self.codes[i], float(score)) for i, score in zip(rows, row_scores) if score > -np.inf]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+    def top_k(self, predicted_vectors, k=5, excluded=None):
+        '''
+        Retourne les héros les plus proches (similarité cosinus) d'un ou plusieurs vecteurs prédits.
+        param predicted_vectors: vecteur (dim,) ou batch de vecteurs (batch, dim)
+        param k: nombre de héros à retourner par vecteur
+        param excluded: masque (n_heroes,) ou (batch, n_heroes) des héros à exclure
+        return: liste de (code, similarité), ou une liste par vecteur pour un batch
+        '''
+        single = np.ndim(predicted_vectors) == 1
+        results = self.rank(self.scores(predicted_vectors, excluded), k)
+        return results[0] if single else results
+
+
+class NumpyMLP:
+    '''
+    Modèle exporté par modele/export.py (Flatten puis couches Dense), évalué par numpy_forward.
+    Remplace le modèle Keras dans l'API sans importer TensorFlow.
+    param artifact: contenu du fichier .npz exporté
+    '''
+
+    def __init__(self, artifact):
+        self.activations = artifact["activations"].tolist()
+        self.kernels = [artifact[f"kernel_{i}"] for i in range(len(self.activations))]
+        self.biases = [artifact[f"bias_{i}"] for i in range(len(self.activations))]
+        self.input_shape = tuple(artifact["input_shape"].tolist())
+
+    def predict_on_batch(self, batch):
+        return numpy_forward(self.kernels, self.biases, self.activations, batch)
+
+    def predict(self, batch, verbose=0):
+        return self.predict_on_batch(batch)
+
+
+class InferenceBatcher:
+    '''
+    Regroupe les drafts reçus pendant quelques millisecondes et les prédit en un seul appel au modèle.
+    La prédiction tourne dans un thread pour ne pas bloquer la boucle d'événements.
+    param predict_batch: fonction (batch, maxlen, dim) -> (batch, dim)
+    param max_batch_size: nombre maximum de drafts par appel au modèle
+    param max_wait_ms: temps d'attente maximum pour compléter un batch
+    '''
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=5):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+
+    async def predict(self, drafts_padded):
+        '''
+        Soumet un ou plusieurs drafts et attend leurs vecteurs prédits.
+        param drafts_padded: tableau (n, maxlen, dim)
+        return: tableau (n, dim)
+        '''
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        futures = []
+        for draft_padded in drafts_padded:
+            future = loop.create_future()
+            self._queue.put_nowait((draft_padded, future))
+            futures.append(future)
+        return np.stack(await asyncio.gather(*futures))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                if not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = np.stack([draft_padded for draft_padded, _ in items])
+            try:
+                predictions = await asyncio.to_thread(self.predict_batch, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), prediction in zip(items, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+
+class RecommendationCache:
+    '''
+    Cache LRU borné avec expiration des candidats bruts (top-k héros et similarités) par draft.
+    Le tirage aléatoire est fait après le cache, les recommandations restent donc non déterministes.
+    Les accès sont protégés par un verrou : plan_draft s'en sert depuis plusieurs threads (asyncio.to_thread).
+    param max_size: nombre maximum de drafts gardés en mémoire
+    param ttl_seconds: durée de vie d'une entrée
+    '''
+
+    def __init__(self, max_size=10000, ttl_seconds=600):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._entries)
+        lookups = hits + misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+
+class Metrics:
+    '''
+    Compteurs, jauges et histogrammes de latence exposés au format texte de Prometheus sur /metrics.
+    Les histogrammes gardent un compteur par borne (cumulés seulement au rendu), observer une durée
+    ne coûte donc qu'une recherche dichotomique et deux additions.
+    param buckets: bornes supérieures des histogrammes, en secondes
+    '''
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        self.counters[self._key(name, labels)] += value
+
+    def set(self, name, value, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        histogram[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        labels = (*labels, *extra)
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+    def clear_counts(self):
+        # à appeler dans un worker juste après fork : les compteurs hérités restent comptés par le parent
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self):
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+            "gauges": [[name, labels, value] for (name, labels), value in self.gauges.items()],
+            "histograms": [[name, labels, counts, total] for (name, labels), (counts, total) in self.histograms.items()]
+        }
+
+    def write_snapshot(self, path):
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def aggregate(cls, directory, buckets=BUCKETS):
+        '''
+        Additionne les métriques écrites par chaque worker de API/serve.py (un fichier <pid>.json par worker).
+        Les compteurs et histogrammes des workers arrêtés restent comptés, les totaux ne baissent donc
+        jamais quand un worker est relancé ; les jauges ne sont gardées que pour les workers en vie,
+        avec un label worker.
+        param directory: dossier des fichiers des workers
+        return: Metrics
+        '''
+        merged = cls(buckets)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = int(name[:-len(".json")])
+            for series, labels, value in snapshot["counters"]:
+                merged.counters[series, tuple(map(tuple, labels))] += value
+            for series, labels, counts, total in snapshot["histograms"]:
+                key = series, tuple(map(tuple, labels))
+                histogram = merged.histograms.setdefault(key, [[0] * (len(buckets) + 1), 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                continue
+            for series, labels, value in snapshot["gauges"]:
+                merged.gauges[series, tuple(sorted((*map(tuple, labels), ("worker", pid))))] = value
+        return merged
+
+    def render(self):
+        lines = []
+        for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+            for name in sorted({name for name, _ in series}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (series_name, labels), (counts, total) in sorted(self.histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def artifacts_version(*paths):
+    '''
+    Calcule une version des artefacts à partir de leur taille et de leur date de modification.
+    param paths: chemins des fichiers du modèle et des embeddings
+    return: identifiant court de la version
+    '''
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def normalize_draft(draft):
+    '''
+    Découpe le draft reçu par l'API en liste de codes sans espaces ni entrées vides.
+    param draft: codes des héros séparés par des virgules
+    return: tuple des codes
+    '''
+    return tuple(code.strip() for code in draft.split(",") if code.strip())
+
+
+DRAFT_SIZE = len(DRAFT_ORDERS["my_team"])
+
+
+def draft_side(slot):
+    return "first_pick" if slot in FIRST_PICK_SLOTS else "second_pick"
+
+
+def composition_key(picks):
+    '''
+    Clé de la table de transposition : les deux compositions d'équipe, sans l'ordre des picks.
+    param picks: codes des héros dans l'ordre du draft
+    return: (héros du first pick, héros du second pick)
+    '''
+    first = frozenset(code for slot, code in enumerate(picks) if slot in FIRST_PICK_SLOTS)
+    return first, frozenset(picks) - first
+
+
+def plan_draft(draft_sequence, banned_sequence, model, hero_index, beam_width=8, branching=5,
+               max_nodes=5000, time_budget_ms=200, transpositions=None, key_prefix=(), chunk_size=128):
+    '''
+    Recherche en faisceau (beam search) des picks restants dans l'ordre du draft.
+    À chaque profondeur, les drafts de la frontière sont prédits par blocs de chunk_size (un seul
+    appel au modèle et à HeroIndex.top_k par bloc), et le budget est vérifié avant chaque bloc :
+    une frontière trop large n'est développée que pour ses meilleurs drafts. Les branches qui ne diffèrent que par l'ordre
+    des picks sont fusionnées, et leurs candidats sont gardés dans une table de transposition indexée
+    par les compositions des deux équipes, qui peut être partagée entre les requêtes.
+    Quand le budget (temps ou nombre de nœuds) est dépassé, la fin du draft est complétée en glouton.
+    Le score d'un plan est la somme des similarités des picks choisis.
+    param draft_sequence: codes des héros déjà pickés
+    param banned_sequence: codes des héros bannis
+    param model: modèle avec predict_on_batch (NumpyMLP ou Keras)
+    param hero_index: index des héros (HeroIndex)
+    param beam_width: nombre de drafts gardés à chaque profondeur
+    param branching: nombre de candidats évalués par draft
+    param max_nodes: nombre maximum de drafts évalués
+    param time_budget_ms: temps maximum avant de passer en glouton
+    param transpositions: table de transposition partagée (RecommendationCache), sinon locale à la recherche
+    param key_prefix: préfixe des clés de la table (version du modèle, bans...)
+    param chunk_size: nombre maximum de drafts prédits par appel au modèle
+    return: dictionnaire décrivant le meilleur plan trouvé
+    '''
+    start = time.perf_counter()
+    rows = [hero_index.key_to_index[code] for code in draft_sequence]  # KeyError si code inconnu
+    banned_mask = hero_index.mask(banned_sequence)
+    dim = hero_index.vectors.shape[1]
+
+    beam = [(0.0, tuple(draft_sequence), tuple(rows))]
+    if transpositions is None:
+        transpositions = RecommendationCache(max_size=max_nodes + beam_width, ttl_seconds=float("inf"))
+    nodes = calls = reused = 0
+    truncated = False
+    expand = branching
+
+    def over_budget():
+        return (time.perf_counter() - start) * 1000 > time_budget_ms or nodes >= max_nodes
+
+    for depth in range(len(draft_sequence), DRAFT_SIZE):
+        if not truncated and over_budget():
+            truncated = True
+            beam, beam_width, expand = beam[:1], 1, 1
+
+        keys = [key_prefix + composition_key(picks) for _, picks, _ in beam]
+        candidates = [transpositions.get(key) for key in keys]
+        todo = [i for i, known in enumerate(candidates) if known is None]
+        reused += len(beam) - len(todo)
+        for chunk_start in range(0, len(todo), chunk_size):
+            if chunk_start and not truncated and over_budget():
+                # la frontière est triée par score : seuls les drafts les moins bien classés sont abandonnés
+                truncated = True
+                beam_width, expand = 1, 1
+            if truncated and chunk_start:
+                break
+            chunk = todo[chunk_start:chunk_start + chunk_size]
+            node_rows = np.array([beam[i][2] for i in chunk])[:, -DRAFT_SIZE:]
+            padded = np.zeros((len(chunk), DRAFT_SIZE, dim), dtype=np.float32)
+            padded[:, DRAFT_SIZE - node_rows.shape[1]:] = hero_index.vectors[node_rows]
+            excluded = np.repeat(banned_mask[None, :], len(chunk), axis=0)
+            np.put_along_axis(excluded, node_rows, True, axis=1)
+            predicted_vectors = model.predict_on_batch(padded)
+            calls += 1
+            for i, top_heroes in zip(chunk, hero_index.top_k(predicted_vectors, k=branching, excluded=excluded)):
+                transpositions.put(keys[i], top_heroes)
+                candidates[i] = top_heroes
+            nodes += len(chunk)
+
+        children = {}
+        for n, ((score, picks, node_rows), top_heroes) in enumerate(zip(beam, candidates)):
+            if n and n % chunk_size == 0 and not truncated and over_budget():
+                truncated = True
+                beam_width, expand = 1, 1
+            if top_heroes is None or (truncated and n and children):
+                continue
+            for code, similarity in top_heroes[:expand]:
+                child = (score + similarity, picks + (code,), node_rows + (hero_index.key_to_index[code],))
+                child_key = composition_key(child[1])
+                if child_key not in children or children[child_key][0] < child[0]:
+                    children[child_key] = child
+        if not children:
+            break
+        beam = sorted(children.values(), key=lambda node: node[0], reverse=True)[:beam_width]
+
+    score, picks, _ = beam[0]
+    plan = []
+    for slot in range(len(draft_sequence), len(picks)):
+        code = picks[slot]
+        plan.append({
+            "slot": slot + 1,
+            "side": draft_side(slot),
+            "hero_code": code,
+            "hero_name": hero_index.names[hero_index.key_to_index[code]]
+        })
+    return {
+        "plan": plan,
+        "score": float(score),
+        "nodes_evaluated": nodes,
+        "model_calls": calls,
+        "transposition_hits": reused,
+        "truncated": truncated,
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    }
+
+
+def score_candidates(draft_sequence, banned_sequence, win_model, hero_index):
+    '''
+    Classe tous les héros encore disponibles par probabilité de victoire pour l'équipe qui pick.
+    Les drafts candidats (draft actuel + un héros) sont construits en un seul batch
+    (n_candidats, 10, dim) et évalués en une seule passe du modèle de victoire.
+    param draft_sequence: codes des héros déjà pickés
+    param banned_sequence: codes des héros bannis
+    param win_model: modèle de victoire (probabilité que le first pick gagne)
+    param hero_index: index des héros (HeroIndex)
+    return: (camp qui pick, liste de (code, probabilité de victoire) triée)
+    '''
+    rows = [hero_index.key_to_index[code] for code in draft_sequence]  # KeyError si code inconnu
+    candidates = np.flatnonzero(~hero_index.mask(tuple(draft_sequence) + tuple(banned_sequence)))
+    dim = hero_index.vectors.shape[1]
+
+    batch = np.zeros((len(candidates), DRAFT_SIZE, dim), dtype=np.float32)
+    if rows:
+        batch[:, DRAFT_SIZE - 1 - len(rows):-1] = hero_index.vectors[rows]
+    batch[:, -1] = hero_index.vectors[candidates]
+    first_pick_wins = np.asarray(win_model.predict_on_batch(batch), dtype=np.float32).reshape(-1)
+
+    side = draft_side(len(rows))
+    scores = first_pick_wins if side == "first_pick" else 1 - first_pick_wins
+    order = np.argsort(-scores)
+    return side, [(hero_index.codes[candidates[i]], float(scores[i])) for i in order]
 
-app = FastAPI()
 
-model = load_model("data/modele2.keras")
-word2vec_model = Word2Vec.load("data/word2vec_16.model")
-hero_dict = load_hero_names("data/heroes.json")
+class PickStatsEngine:
+    '''
+    Recommandeur statistique construit hors ligne par collect_process_data/pick_stats.py.
+    Les comptages (slot, alliés, adversaires, transitions) sont normalisés par ligne au chargement :
+    scorer un draft ne coûte ensuite que quelques sommes de lignes.
+    param artifact: contenu du fichier pick_stats.npz
+    '''
+
+    def __init__(self, artifact):
+        self.codes = artifact["codes"].tolist()
+        self.key_to_index = {code: i for i, code in enumerate(self.codes)}
+        self.slot_rates = self._normalize(artifact["slot_counts"])
+        self.ally_rates = self._normalize(artifact["ally"])
+        self.enemy_rates = self._normalize(artifact["enemy"])
+        self.transition_rates = self._normalize(artifact["transitions"])
+        self.n_battles = int(artifact["n_battles"])
+        self.alignment = None
+
+    @staticmethod
+    def _normalize(counts):
+        counts = np.asarray(counts, dtype=np.float32)
+        return counts / np.maximum(counts.sum(axis=-1, keepdims=True), 1)
+
+    def align(self, codes):
+        '''
+        Aligne les scores sur un autre ordre de héros (celui de HeroIndex) pour les mélanger.
+        Les héros absents des statistiques pointent sur l'index 0 (padding), de score nul.
+        '''
+        self.alignment = np.array([self.key_to_index.get(code, 0) for code in codes])
+
+    def scores(self, draft_sequence, banned_sequence=()):
+        '''
+        Score de chaque héros pour le prochain pick : fréquence au slot, affinité moyenne avec les
+        alliés, fréquence moyenne face aux adversaires et transition depuis le pick précédent.
+        Les codes inconnus des statistiques sont ignorés.
+        param draft_sequence: codes des héros déjà pickés (moins de 10)
+        param banned_sequence: codes des héros bannis
+        return: tableau (n_heroes,) normalisé à 1, nul pour les héros pickés ou bannis
+        '''
+        slot = len(draft_sequence)
+        side = draft_side(slot)
+        rows = [self.key_to_index.get(code) for code in draft_sequence]
+        allies = [row for s, row in enumerate(rows) if row is not None and draft_side(s) == side]
+        enemies = [row for s, row in enumerate(rows) if row is not None and draft_side(s) != side]
+
+        score = self.slot_rates[slot].copy()
+        if allies:
+            score += self.ally_rates[allies].mean(axis=0)
+        if enemies:
+            score += self.enemy_rates[enemies].mean(axis=0)
+        if slot > 0 and rows[-1] is not None:
+            score += self.transition_rates[slot, rows[-1]]
+
+        excluded = [self.key_to_index[code] for code in (*draft_sequence, *banned_sequence) if code in self.key_to_index]
+        score[excluded] = 0
+        score[0] = 0
+        total = score.sum()
+        return score / total if total > 0 else score
+
+    def aligned_scores(self, draft_sequence, banned_sequence=()):
+        return self.scores(draft_sequence, banned_sequence)[self.alignment]
+
+    def top_k(self, draft_sequence, banned_sequence=(), k=5):
+        score = self.scores(draft_sequence, banned_sequence)
+        k = min(k, len(score))
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top])]
+        return [(self.codes[i], float(score[i])) for i in top if score[i] > 0]
+
+
+ENGINES = ("neural", "stats", "blend")
+BLEND_WEIGHT = 0.3
+NEURAL_TIMEOUT_S = 0.5
+
+
+class DraftSession:
+    '''
+    État d'un draft en cours côté serveur (WebSocket /ws/draft) : le client n'envoie que les
+    picks et bans un par un. Le préfixe déjà rempli (maxlen, dim) et le masque des héros
+    exclus sont mis à jour en place ; les candidats sont gardés tant que le draft ne change pas.
+    param hero_index: index des héros (None si seul le moteur statistique est chargé)
+    param version: version des artefacts utilisés pour construire le préfixe
+    param draft: picks déjà faits
+    param banned: héros déjà bannis
+    param allow_unknown: accepte les héros absents de hero_index (le moteur statistique répond alors)
+    '''
+
+    def __init__(self, hero_index, version, draft=(), banned=(), allow_unknown=False):
+        self.picks = []
+        self.banned = []
+        self.allow_unknown = allow_unknown
+        self.bind(hero_index, version)
+        for code in draft:
+            self.pick(code)
+        for code in banned:
+            self.ban(code)
+
+    def bind(self, hero_index, version):
+        '''
+        Reconstruit le préfixe et le masque, à la création de la session ou après un rechargement des artefacts.
+        '''
+        self.hero_index = hero_index
+        self.version = version
+        self.candidates = None
+        self.unknown = [code for code in self.picks if hero_index is None or code not in hero_index.key_to_index]
+        if hero_index is None:
+            self.buffer, self.excluded = None, None
+            return
+        known = [code for code in self.picks if code in hero_index.key_to_index]
+        self.buffer = transform_draft_to_vectors_padded(known, hero_index, maxlen=DRAFT_SIZE)[0]
+        self.excluded = hero_index.mask(self.picks + self.banned)
+
+    def pick(self, code):
+        if not code:
+            raise ValueError("Hero code cannot be empty")
+        if len(self.picks) >= DRAFT_SIZE:
+            raise ValueError("Draft is already complete")
+        if code in self.picks or code in self.banned:
+            raise ValueError(f"Hero already picked or banned: {code}")
+        row = self.hero_index.key_to_index.get(code) if self.hero_index is not None else None
+        if row is None:
+            if not self.allow_unknown:
+                raise ValueError(f"Hero code not found in Word2Vec model: {code}")
+            self.unknown.append(code)
+        else:
+            # décale le préfixe d'un cran et écrit le nouveau pick en dernière position
+            self.buffer[:-1] = self.buffer[1:]
+            self.buffer[-1] = self.hero_index.vectors[row]
+            self.excluded[row] = True
+        self.picks.append(code)
+        self.candidates = None
+
+    def ban(self, code):
+        if not code:
+            raise ValueError("Hero code cannot be empty")
+        if code in self.picks or code in self.banned:
+            raise ValueError(f"Hero already picked or banned: {code}")
+        self.banned.append(code)
+        if self.excluded is not None and code in self.hero_index.key_to_index:
+            self.excluded[self.hero_index.key_to_index[code]] = True
+        self.candidates = None
+
+    def undo(self):
+        if not self.picks:
+            raise ValueError("Draft is empty")
+        self.picks.pop()
+        self.bind(self.hero_index, self.version)
+
+
+class ArtifactBundle:
+    '''
+    Ensemble cohérent des artefacts servis : modèle, embeddings, noms, statistiques et modèle de victoire.
+    Chaque requête lit le bundle courant une seule fois, un rechargement ne mélange donc jamais
+    deux versions dans une même réponse. Le bundle a son propre InferenceBatcher.
+    param version: version des artefacts (clé des caches)
+    param model: modèle de prédiction du prochain pick (None si indisponible)
+    param hero_dict: dictionnaire mappant les codes des héros à leurs noms
+    param hero_index: index de similarité des héros (None si indisponible)
+    param win_model: modèle de victoire (None si indisponible)
+    param pick_stats: PickStatsEngine (None si indisponible)
+    '''
+
+    def __init__(self, version, model, hero_dict, hero_index, win_model=None, pick_stats=None):
+        self.version = version
+        self.model = model
+        self.hero_dict = hero_dict
+        self.hero_names = HeroNameIndex(hero_dict)
+        self.hero_index = hero_index
+        self.win_model = win_model
+        self.pick_stats = pick_stats
+        self.directory = None
+        self.batcher = InferenceBatcher(model.predict_on_batch, max_batch_size=64, max_wait_ms=5) if model is not None else None
+
+
+class DraftBatch(BaseModel):
+    drafts: list[str]
+    banned: list[str] = []
+    engine: str = "neural"
+
+@asynccontextmanager
+async def lifespan(app):
+    # processus seul : il surveille le pointeur CURRENT et SIGHUP force la vérification ;
+    # sous API/serve.py, c'est le parent qui recharge puis remplace les workers
+    loop = asyncio.get_running_loop()
+    watcher = None
+    if not os.environ.get("API_SERVE_PARENT_PID"):
+        watcher = loop.create_task(watch_artifacts())
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(try_refresh_artifacts()))
+            except (NotImplementedError, RuntimeError):
+                pass
+    dumper = loop.create_task(dump_metrics()) if METRICS_DIR else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if dumper is not None:
+        dumper.cancel()
+        write_metrics_snapshot()
+
+app = FastAPI(lifespan=lifespan)
+
+metrics = Metrics()
+logger = logging.getLogger("api")
+# sous API/serve.py, chaque worker écrit ses métriques dans ce dossier et /metrics les additionne
+METRICS_DIR = os.environ.get("API_METRICS_DIR", "")
+METRICS_DUMP_S = 1
+
+def write_metrics_snapshot():
+    metrics.write_snapshot(os.path.join(METRICS_DIR, f"{os.getpid()}.json"))
+
+async def dump_metrics(interval=METRICS_DUMP_S):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_metrics_snapshot()
+        except OSError:
+            logger.exception("Could not write the metrics of worker %s", os.getpid())
+SLOW_REQUEST_S = 0.25
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+
+draft_sessions = {}
+MAX_DRAFT_SESSIONS = 10000
+SESSION_IDLE_S = 300
+
+def error_response(kind, message):
+    '''
+    Réponse d'erreur de l'API (toujours {"error": ...}), comptée par type d'erreur dans /metrics.
+    param kind: type d'erreur (invalid_draft, unknown_hero, prediction_error...)
+    param message: message renvoyé au client
+    return: dictionnaire d'erreur
+    '''
+    metrics.inc("api_errors_total", kind=kind)
+    return {"error": message}
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    endpoint = request.scope.get("route").path if request.scope.get("route") else "unmatched"
+    metrics.inc("api_requests_total", endpoint=endpoint, status=response.status_code)
+    metrics.observe("api_request_seconds", elapsed, endpoint=endpoint)
+    # les requêtes lentes sont journalisées avec leur draft, sur un échantillon
+    if elapsed > SLOW_REQUEST_S and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+        # les paramètres des routes /admin/ ne sont jamais journalisés
+        params = {} if request.url.path.startswith("/admin/") else dict(request.query_params)
+        logger.warning("Slow request %s %.1f ms: %s", request.url.path, elapsed * 1000, params)
+    return response
+
+ARTIFACTS_ROOT = "data/artifacts"
+ARTIFACTS_POLL_S = 5
+ADMIN_TOKEN = os.environ.get("API_ADMIN_TOKEN", "")
+# fichiers d'un répertoire d'artefacts versionné, par paramètre de load_bundle
+ARTIFACT_FILES = {
+    "artifact_path": "modele2.npz",
+    "model_path": "modele2.keras",
+    "word2vec_path": "word2vec_16.model",
+    "heroes_path": "heroes.json",
+    "win_artifact_path": "win_model.npz",
+    "win_model_path": "win_model.keras",
+    "stats_path": "pick_stats.npz",
+}
+
+cache = RecommendationCache(max_size=10000, ttl_seconds=600)
+plan_cache = RecommendationCache(max_size=100000, ttl_seconds=600)
+# bornes des paramètres de /draft_plan
+PLAN_MAX_BEAM_WIDTH = 64
+PLAN_MAX_BRANCHING = 20
+PLAN_MAX_NODES = 20000
+PLAN_MAX_TIME_BUDGET_MS = 200
+# nombre maximum de drafts par requête POST /next_picks
+MAX_BATCH_DRAFTS = 256
+
+def load_bundle(artifact_path="data/modele2.npz", model_path="data/modele2.keras",
+                   word2vec_path="data/word2vec_16.model", heroes_path="data/heroes.json",
+                   win_artifact_path="data/win_model.npz", win_model_path="data/win_model.keras",
+                   stats_path="data/pick_stats.npz"):
+    '''
+    Charge le modèle, les embeddings et les noms des héros dans un nouvel ArtifactBundle.
+    L'artefact .npz (modele/export.py) est utilisé en priorité : il ne demande que NumPy.
+    Sans lui, le modèle Keras et le modèle Word2Vec sont chargés avec TensorFlow et gensim.
+    param artifact_path: chemin de l'artefact NumPy exporté
+    param model_path: chemin du modèle Keras
+    param word2vec_path: chemin du modèle Word2Vec
+    param heroes_path: chemin du fichier JSON des noms des héros
+    param win_artifact_path: chemin de l'artefact NumPy du modèle de victoire (modele/win_model.py)
+    param win_model_path: chemin du modèle de victoire Keras, utilisé si l'artefact NumPy manque
+    param stats_path: chemin des statistiques de picks (collect_process_data/pick_stats.py)
+    return: ArtifactBundle
+    '''
+    start = time.perf_counter()
+    hero_dict = load_hero_names(heroes_path)
+    metrics.set("api_artifact_load_seconds", time.perf_counter() - start, artifact="heroes")
+
+    start = time.perf_counter()
+    if os.path.exists(artifact_path):
+        with np.load(artifact_path) as artifact:
+            model = NumpyMLP(artifact)
+            hero_index = HeroIndex.from_artifact(artifact, hero_dict)
+        model_version = artifacts_version(artifact_path)
+    else:
+        try:
+            from tensorflow.keras.models import load_model
+            from gensim.models import Word2Vec
+        except ImportError:
+            # sans artefact NumPy ni TensorFlow, seules les statistiques de picks répondent
+            model, hero_index = None, None
+            model_version = artifacts_version(stats_path) if os.path.exists(stats_path) else "none"
+        else:
+            model = load_model(model_path)
+            hero_index = HeroIndex.from_word2vec(Word2Vec.load(word2vec_path), hero_dict)
+            model_version = artifacts_version(model_path, word2vec_path)
+    metrics.set("api_artifact_load_seconds", time.perf_counter() - start, artifact="model")
+
+    start = time.perf_counter()
+    pick_stats = None
+    if os.path.exists(stats_path):
+        with np.load(stats_path) as artifact:
+            pick_stats = PickStatsEngine(artifact)
+        if hero_index is not None:
+            pick_stats.align(hero_index.codes)
+        # le mode "blend" dépend aussi des statistiques : elles entrent dans la version du cache
+        model_version = f"{model_version}-{artifacts_version(stats_path)}"
+    metrics.set("api_artifact_load_seconds", time.perf_counter() - start, artifact="pick_stats")
+
+    start = time.perf_counter()
+    # le modèle de victoire est optionnel : /win_probabilities/ répond une erreur sans lui
+    win_model = None
+    if os.path.exists(win_artifact_path):
+        with np.load(win_artifact_path) as artifact:
+            win_model = NumpyMLP(artifact)
+    elif os.path.exists(win_model_path):
+        from tensorflow.keras.models import load_model
+        win_model = load_model(win_model_path)
+    metrics.set("api_artifact_load_seconds", time.perf_counter() - start, artifact="win_model")
+    return ArtifactBundle(model_version, model, hero_dict, hero_index, win_model, pick_stats)
+
+def install_bundle(bundle):
+    '''
+    Remplace les artefacts servis. Le remplacement est une seule affectation : les requêtes en cours
+    gardent une référence vers l'ancien bundle (et son InferenceBatcher) et se terminent avec lui.
+    param bundle: ArtifactBundle
+    '''
+    global artifacts
+    artifacts = bundle
+    metrics.inc("api_artifact_loads_total")
+    metrics.set("api_artifact_loaded_timestamp_seconds", time.time())
+    cache.clear()
+    plan_cache.clear()
+
+def load_artifacts(**paths):
+    '''
+    Charge et installe les artefacts (mêmes paramètres que load_bundle).
+    '''
+    install_bundle(load_bundle(**paths))
+
+def current_artifact_dir(root=ARTIFACTS_ROOT):
+    '''
+    Répertoire d'artefacts versionné pointé par le fichier CURRENT de root (None s'il n'existe pas).
+    '''
+    pointer = os.path.join(root, "CURRENT")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, "r", encoding="utf-8") as f:
+        return os.path.join(root, f.read().strip())
+
+def load_artifact_dir(artifact_dir):
+    '''
+    Charge un répertoire d'artefacts versionné (voir API/serve.py publish).
+    param artifact_dir: répertoire contenant modele2.npz, heroes.json et les artefacts optionnels
+    return: ArtifactBundle
+    '''
+    bundle = load_bundle(**{param: os.path.join(artifact_dir, name) for param, name in ARTIFACT_FILES.items()})
+    bundle.directory = artifact_dir
+    return bundle
+
+async def refresh_artifacts(root=ARTIFACTS_ROOT, force=False):
+    '''
+    Installe la version pointée par CURRENT si elle a changé (ou si force=True).
+    Le chargement se fait dans un thread, la boucle continue de servir l'ancienne version pendant ce temps.
+    return: True si une nouvelle version a été installée
+    '''
+    artifact_dir = current_artifact_dir(root)
+    if artifact_dir is None or (not force and artifact_dir == artifacts.directory):
+        return False
+    install_bundle(await asyncio.to_thread(load_artifact_dir, artifact_dir))
+    logger.warning("Artifacts reloaded from %s (version %s)", artifact_dir, artifacts.version)
+    return True
+
+async def try_refresh_artifacts(root=ARTIFACTS_ROOT):
+    '''
+    refresh_artifacts sans exception : une version illisible est journalisée et l'ancienne reste servie.
+    '''
+    try:
+        return await refresh_artifacts(root)
+    except Exception:
+        metrics.inc("api_errors_total", kind="artifact_reload")
+        logger.exception("Artifact reload failed, keeping version %s", artifacts.version)
+        return False
+
+async def watch_artifacts(root=ARTIFACTS_ROOT, interval=ARTIFACTS_POLL_S):
+    while True:
+        await asyncio.sleep(interval)
+        await try_refresh_artifacts(root)
+
+startup = time.perf_counter()
+if current_artifact_dir() is not None:
+    install_bundle(load_artifact_dir(current_artifact_dir()))
+else:
+    load_artifacts()
+metrics.set("api_startup_seconds", time.perf_counter() - startup)
 
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+async def recommend_many(drafts, banned=None, engine="neural"):
+    '''
+    Recommande le prochain pick de plusieurs drafts : les drafts absents du cache sont prédits
+    ensemble par l'InferenceBatcher puis classés en un seul appel à HeroIndex.rank.
+    Les statistiques de picks prennent le relais pour les ouvertures, les codes inconnus du modèle,
+    et quand le modèle est indisponible, en erreur ou plus lent que NEURAL_TIMEOUT_S.
+    param drafts: liste de drafts (codes des héros séparés par des virgules)
+    param banned: liste des héros bannis de chaque draft (même format), optionnelle
+    param engine: "neural", "stats" ou "blend" (mélange des deux scores)
+    return: liste des dictionnaires de réponse (ou d'erreur), dans l'ordre des drafts
+    '''
+    bundle = artifacts
+    if engine not in ENGINES:
+        return [error_response("unknown_engine", f"Unknown engine: {engine}") for _ in drafts]
+    banned = list(banned or []) + [""] * (len(drafts) - len(banned or []))
+    results = [None] * len(drafts)
+    candidates = {}
+    pending = []
+    fallbacks = {}
+    for i, (draft, bans) in enumerate(zip(drafts, banned)):
+        try:
+            with metrics.timer("api_stage_seconds", stage="parse"):
+                draft_sequence = normalize_draft(draft)
+                banned_sequence = normalize_draft(bans)
+        except Exception as e:
+            results[i] = error_response("invalid_draft", f"Invalid draft format: {str(e)}")
+            continue
+        if not draft_sequence and bundle.pick_stats is None:
+            results[i] = error_response("empty_draft", "Draft cannot be empty")
+            continue
+        if engine == "stats" or bundle.model is None or not draft_sequence:
+            reason = None if engine == "stats" else ("model_unavailable" if bundle.model is None else "opening")
+            fallbacks[i] = (draft_sequence, banned_sequence, reason)
+            continue
+        cache_key = (bundle.version, engine, draft_sequence, tuple(sorted(banned_sequence)))
+        closest_heroes = cache.get(cache_key)
+        if closest_heroes is not None:
+            candidates[i] = closest_heroes
+            continue
+        try:
+            with metrics.timer("api_stage_seconds", stage="vectorize"):
+                draft_padded = transform_draft_to_vectors_padded(draft_sequence, bundle.hero_index, maxlen=10)
+        except KeyError as e:
+            if bundle.pick_stats is not None:
+                fallbacks[i] = (draft_sequence, banned_sequence, "unknown_hero")
+            else:
+                results[i] = error_response("unknown_hero", f"Hero code not found in Word2Vec model: {str(e)}")
+            continue
+        pending.append((i, cache_key, draft_padded[0], draft_sequence, banned_sequence))
+
+    if pending:
+        try:
+            with metrics.timer("api_stage_seconds", stage="predict"):
+                predicted_vectors = await asyncio.wait_for(
+                    bundle.batcher.predict(np.stack([draft_padded for _, _, draft_padded, _, _ in pending])),
+                    NEURAL_TIMEOUT_S if bundle.pick_stats is not None else None
+                )
+            with metrics.timer("api_stage_seconds", stage="rank"):
+                excluded = np.stack([bundle.hero_index.mask(draft_sequence + banned_sequence) for *_, draft_sequence, banned_sequence in pending])
+                scores = bundle.hero_index.scores(predicted_vectors, excluded=excluded)
+                if engine == "blend" and bundle.pick_stats is not None:
+                    stats_scores = np.stack([bundle.pick_stats.aligned_scores(draft_sequence, banned_sequence) for *_, draft_sequence, banned_sequence in pending])
+                    stats_scores /= np.maximum(stats_scores.max(axis=1, keepdims=True), 1e-12)
+                    scores = (1 - BLEND_WEIGHT) * scores + BLEND_WEIGHT * stats_scores
+                top_heroes = bundle.hero_index.rank(scores, k=5)
+        except Exception as e:
+            kind = "timeout" if isinstance(e, asyncio.TimeoutError) else "prediction_error"
+            for i, *_, draft_sequence, banned_sequence in pending:
+                if bundle.pick_stats is not None:
+                    fallbacks[i] = (draft_sequence, banned_sequence, kind)
+                else:
+                    results[i] = error_response(kind, f"Error during prediction: {str(e)}")
+            top_heroes = []
+        for (i, cache_key, *_), closest_heroes in zip(pending, top_heroes):
+            cache.put(cache_key, closest_heroes)
+            candidates[i] = closest_heroes
+
+    engines = {}
+    for i, (draft_sequence, banned_sequence, reason) in fallbacks.items():
+        if bundle.pick_stats is None:
+            results[i] = error_response("stats_unavailable", "Pick statistics are not available")
+            continue
+        if len(draft_sequence) >= DRAFT_SIZE:
+            results[i] = error_response("draft_complete", "Draft is already complete")
+            continue
+        with metrics.timer("api_stage_seconds", stage="stats"):
+            candidates[i] = bundle.pick_stats.top_k(draft_sequence, banned_sequence, k=5)
+        engines[i] = ("stats", reason)
+        if reason:
+            metrics.inc("api_fallbacks_total", reason=reason)
+
+    for i, closest_heroes in candidates.items():
+        try:
+            with metrics.timer("api_stage_seconds", stage="name_lookup"):
+                hero_code, similarity = random.choices(closest_heroes, k=1)[0]
+                hero_name = get_hero_name(hero_code, bundle.hero_dict)
+        except Exception as e:
+            results[i] = error_response("name_lookup", f"Error retrieving hero name: {str(e)}")
+            continue
+        used_engine, reason = engines.get(i, (engine, None))
+        if used_engine == "blend" and bundle.pick_stats is None:
+            # sans statistiques, le score "blend" est celui du modèle seul
+            used_engine, reason = "neural", "stats_unavailable"
+            metrics.inc("api_fallbacks_total", reason=reason)
+        results[i] = {
+            "predicted_hero_code": hero_code,
+            "predicted_hero_name": hero_name,
+            "similarity": float(similarity),
+            "engine": used_engine
+        }
+        if reason:
+            results[i]["fallback_reason"] = reason
+    return results
+
 @app.get("/next_pick/")
-async def next_pick(draft: str):
+async def next_pick(draft: str, banned: str = "", engine: str = "neural"):
+    return (await recommend_many([draft], [banned], engine))[0]
+
+@app.post("/next_picks")
+async def next_picks(batch: DraftBatch):
+    if len(batch.drafts) > MAX_BATCH_DRAFTS or len(batch.banned) > MAX_BATCH_DRAFTS:
+        return error_response("batch_too_large", f"Too many drafts in one request (maximum {MAX_BATCH_DRAFTS})")
+    return {"results": await recommend_many(batch.drafts, batch.banned, batch.engine)}
+
+async def session_recommendations(session):
+    '''
+    Recommandations d'une session de draft, recalculées seulement si le draft a changé depuis
+    le dernier message. Même moteur que /next_pick/ : modèle neuronal sur le préfixe de la session,
+    statistiques de picks pour l'ouverture, les codes inconnus et les erreurs du modèle.
+    param session: DraftSession
+    return: dictionnaire envoyé au client
+    '''
+    bundle = artifacts
+    if session.version != bundle.version:
+        session.allow_unknown = bundle.pick_stats is not None
+        session.bind(bundle.hero_index, bundle.version)
+    state = {"draft": session.picks, "banned": session.banned, "slot": len(session.picks) + 1}
+    if len(session.picks) >= DRAFT_SIZE:
+        return {**state, "complete": True, "candidates": []}
+    if session.candidates is None:
+        reason = None
+        if bundle.model is None:
+            reason = "model_unavailable"
+        elif not session.picks:
+            reason = "opening"
+        elif session.unknown:
+            reason = "unknown_hero"
+        else:
+            try:
+                with metrics.timer("api_stage_seconds", stage="session_predict"):
+                    predicted_vectors = await asyncio.wait_for(
+                        bundle.batcher.predict(session.buffer[None]),
+                        NEURAL_TIMEOUT_S if bundle.pick_stats is not None else None
+                    )
+                    scores = bundle.hero_index.scores(predicted_vectors, excluded=session.excluded[None])
+                session.candidates = ("neural", None, bundle.hero_index.rank(scores, k=5)[0])
+            except Exception as e:
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "prediction_error"
+                if bundle.pick_stats is None:
+                    return error_response(reason, f"Error during prediction: {str(e)}")
+        if session.candidates is None:
+            if bundle.pick_stats is None:
+                if reason == "opening":
+                    return {**state, "side": draft_side(len(session.picks)), "candidates": []}
+                return error_response("stats_unavailable", "Pick statistics are not available")
+            metrics.inc("api_fallbacks_total", reason=reason)
+            session.candidates = ("stats", reason, bundle.pick_stats.top_k(session.picks, session.banned, k=5))
+
+    engine, reason, candidates = session.candidates
+    state.update({
+        "side": draft_side(len(session.picks)),
+        "engine": engine,
+        "candidates": [
+            {"hero_code": code, "hero_name": get_hero_name(code, bundle.hero_dict), "similarity": float(similarity)}
+            for code, similarity in candidates
+        ]
+    })
+    if reason:
+        state["fallback_reason"] = reason
+    return state
+
+@app.websocket("/ws/draft")
+async def draft_session(websocket: WebSocket, draft: str = "", banned: str = ""):
+    '''
+    Session de draft : le serveur garde le draft, le client envoie un message JSON par action
+    ({"action": "pick" | "ban", "hero": code}, {"action": "undo"} ou {"action": "state"})
+    et reçoit les recommandations mises à jour. Les sessions inactives depuis SESSION_IDLE_S
+    sont fermées, et au-delà de MAX_DRAFT_SESSIONS les nouvelles connexions sont refusées.
+    '''
+    bundle = artifacts
+    if len(draft_sessions) >= MAX_DRAFT_SESSIONS:
+        metrics.inc("api_draft_sessions_total", outcome="rejected")
+        await websocket.close(code=1013, reason="Too many draft sessions")
+        return
+    await websocket.accept()
+    try:
+        session = DraftSession(bundle.hero_index, bundle.version, normalize_draft(draft), normalize_draft(banned),
+                               allow_unknown=bundle.pick_stats is not None)
+    except Exception as e:
+        await websocket.send_json(error_response("invalid_draft", f"Invalid draft format: {str(e)}"))
+        await websocket.close(code=1003)
+        return
+
+    draft_sessions[id(session)] = session
+    metrics.inc("api_draft_sessions_total", outcome="opened")
+    metrics.set("api_draft_sessions", len(draft_sessions))
+    try:
+        await websocket.send_json(await session_recommendations(session))
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive(), SESSION_IDLE_S)
+            except asyncio.TimeoutError:
+                metrics.inc("api_draft_sessions_total", outcome="idle")
+                await websocket.close(code=1000, reason="Idle session")
+                break
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            # trames texte ou binaires (JSON encodé en UTF-8)
+            try:
+                message = json.loads(frame["text"] if frame.get("text") is not None else frame.get("bytes") or b"")
+            except ValueError as e:
+                await websocket.send_json(error_response("invalid_message", f"Invalid message: {str(e)}"))
+                continue
+            action = message.get("action") if isinstance(message, dict) else None
+            try:
+                if action == "pick":
+                    session.pick(str(message.get("hero", "")).strip())
+                elif action == "ban":
+                    session.ban(str(message.get("hero", "")).strip())
+                elif action == "undo":
+                    session.undo()
+                elif action != "state":
+                    raise ValueError(f"Unknown action: {action}")
+            except ValueError as e:
+                await websocket.send_json(error_response("invalid_message", str(e)))
+                continue
+            await websocket.send_json(await session_recommendations(session))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        draft_sessions.pop(id(session), None)
+        metrics.set("api_draft_sessions", len(draft_sessions))
+
+@app.get("/draft_plan")
+async def draft_plan(draft: str, banned: str = "", beam_width: int = 8, branching: int = 5,
+                     max_nodes: int = 5000, time_budget_ms: float = 200):
+    bundle = artifacts
     try:
-        draft_sequence = draft.split(",")
+        draft_sequence = normalize_draft(draft)
+        banned_sequence = normalize_draft(banned)
     except Exception as e:
-        return {"error": f"Invalid draft format: {str(e)}"}
+        return error_response("invalid_draft", f"Invalid draft format: {str(e)}")
+    if not draft_sequence:
+        return error_response("empty_draft", "Draft cannot be empty")
+    if len(draft_sequence) >= DRAFT_SIZE:
+        return error_response("draft_complete", "Draft is already complete")
+    # les paramètres du client sont bornés : la latence reste celle fixée côté serveur
+    branching = min(max(1, branching), PLAN_MAX_BRANCHING)
+    beam_width = min(max(1, beam_width), PLAN_MAX_BEAM_WIDTH)
+    max_nodes = min(max(1, max_nodes), PLAN_MAX_NODES)
+    time_budget_ms = min(max(0.0, time_budget_ms), PLAN_MAX_TIME_BUDGET_MS)
     try:
-        draft_padded = transform_draft_to_vectors_padded(draft_sequence, word2vec_model, maxlen=10)
+        result = await asyncio.to_thread(
+            plan_draft, draft_sequence, banned_sequence, bundle.model, bundle.hero_index,
+            beam_width=beam_width, branching=branching,
+            max_nodes=max_nodes, time_budget_ms=time_budget_ms, transpositions=plan_cache,
+            key_prefix=(bundle.version, tuple(sorted(banned_sequence)), branching)
+        )
     except KeyError as e:
-        return {"error": f"Hero code not found in Word2Vec model: {str(e)}"}
+        return error_response("unknown_hero", f"Hero code not found in Word2Vec model: {str(e)}")
+    except Exception as e:
+        return error_response("planning_error", f"Error during planning: {str(e)}")
+    return {"draft": list(draft_sequence), **result}
+
+@app.get("/win_probabilities/")
+async def win_probabilities(draft: str = "", banned: str = "", limit: int = 0):
+    bundle = artifacts
+    if bundle.win_model is None:
+        return error_response("win_model_unavailable", "Win probability model is not available")
     try:
-        top_hero = choose_top_heroes(draft_padded, model, word2vec_model, topn=5)
+        draft_sequence = normalize_draft(draft)
+        banned_sequence = normalize_draft(banned)
     except Exception as e:
-        return {"error": f"Error during prediction: {str(e)}"}
+        return error_response("invalid_draft", f"Invalid draft format: {str(e)}")
+    if len(draft_sequence) >= DRAFT_SIZE:
+        return error_response("draft_complete", "Draft is already complete")
     try:
-        hero_code, similarity = top_hero[0]
-        hero_name = get_hero_name(hero_code, hero_dict)
+        side, ranking = score_candidates(draft_sequence, banned_sequence, bundle.win_model, bundle.hero_index)
+    except KeyError as e:
+        return error_response("unknown_hero", f"Hero code not found in Word2Vec model: {str(e)}")
     except Exception as e:
-        return {"error": f"Error retrieving hero name: {str(e)}"}
+        return error_response("prediction_error", f"Error during prediction: {str(e)}")
+    if limit > 0:
+        ranking = ranking[:limit]
     return {
-        "predicted_hero_code": hero_code,
-        "predicted_hero_name": hero_name,
-        "similarity": float(similarity)
+        "slot": len(draft_sequence) + 1,
+        "side": side,
+        "candidates": [
+            {"hero_code": code, "hero_name": get_hero_name(code, bundle.hero_dict), "win_probability": probability}
+            for code, probability in ranking
+        ]
     }
 
+@app.get("/cache_stats/")
+async def cache_stats():
+    bundle = artifacts
+    return {"model_version": bundle.version, **cache.stats(), "draft_plan": plan_cache.stats()}
+
 @app.get("/get_name/")
 async def get_name(hero_code: str):
+    bundle = artifacts
     if(hero_code == ""):
-        return {"error": "Hero code cannot be empty"}
-    hero_name = get_hero_name(hero_code, hero_dict)
+        return error_response("empty_hero_code", "Hero code cannot be empty")
+    hero_name = get_hero_name(hero_code, bundle.hero_dict)
     return {"hero_code": hero_code, "hero_name": hero_name}
 
 @app.get("/get_codes/")
 async def get_codes(hero_name: str):
-    codes = [code for code, name in hero_dict.items() if name.lower() == hero_name.lower()]
+    bundle = artifacts
+    codes = bundle.hero_names.codes(hero_name)
     if not codes:
-        return {"error": f"No hero codes found for hero name: {hero_name}"}
+        return error_response("unknown_hero_name", f"No hero codes found for hero name: {hero_name}")
     codes_str = ", ".join(codes)
-    return {"hero_name": hero_name, "hero_codes": codes_str}
\ No newline at end of file
+    return {"hero_name": hero_name, "hero_codes": codes_str}
+
+@app.get("/search_heroes")
+async def search_heroes(q: str, limit: int = 10):
+    bundle = artifacts
+    if limit < 1:
+        return error_response("invalid_limit", "Limit must be positive")
+    return {"query": q, "results": bundle.hero_names.search(q, limit)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    metrics.set("api_cache_entries", cache.stats()["size"], cache="next_pick")
+    metrics.set("api_cache_entries", plan_cache.stats()["size"], cache="draft_plan")
+    if METRICS_DIR:
+        write_metrics_snapshot()
+        return Metrics.aggregate(METRICS_DIR, metrics.buckets).render()
+    return metrics.render()
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request, force: bool = False):
+    '''
+    Recharge les artefacts. Le jeton est lu dans un en-tête (Authorization: Bearer <jeton> ou
+    X-Admin-Token), jamais dans l'URL, qui finit dans les journaux d'accès.
+    '''
+    # sans API_ADMIN_TOKEN, le rechargement ne passe que par CURRENT et SIGHUP
+    if not ADMIN_TOKEN:
+        return error_response("admin_disabled", "Admin endpoints are disabled (API_ADMIN_TOKEN is not set)")
+    authorization = request.headers.get("authorization", "")
+    token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return error_response("unauthorized", "Invalid admin token")
+    # sous API/serve.py, le parent charge la nouvelle version puis remplace les workers :
+    # le worker ne charge rien lui-même et répond avec la version qu'il sert encore
+    parent = os.environ.get("API_SERVE_PARENT_PID")
+    if parent:
+        os.kill(int(parent), signal.SIGUSR1 if force else signal.SIGHUP)
+        return {"reloaded": False, "scheduled": True, "model_version": artifacts.version, "directory": artifacts.directory}
+    try:
+        reloaded = await refresh_artifacts(force=force)
+    except Exception as e:
+        return error_response("artifact_reload", f"Error reloading artifacts: {str(e)}")
+    return {"reloaded": reloaded, "scheduled": False, "model_version": artifacts.version, "directory": artifacts.directory}
@@ -0,0 +1,211 @@
+import argparse
+import gc
+import hashlib
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import traceback
+
+import uvicorn
+
+import api
+
+
+def publish(files, root=api.ARTIFACTS_ROOT, version=None):
+    '''
+    Publie une nouvelle version des artefacts dans un répertoire versionné, puis fait pointer
+    CURRENT dessus. Le répertoire est écrit sous un nom temporaire puis renommé, et CURRENT est
+    remplacé par os.replace : un worker ne voit jamais une version à moitié copiée.
+    Le parent de serve la charge à sa prochaine vérification (ou sur SIGHUP) puis remplace les workers.
+    param files: fichiers à publier (modele2.npz, heroes.json, pick_stats.npz, win_model.npz...)
+    param root: répertoire des versions
+    param version: nom de la version (par défaut date + empreinte des fichiers)
+    return: chemin du répertoire publié
+    '''
+    known = set(api.ARTIFACT_FILES.values())
+    unknown = [path for path in files if os.path.basename(path) not in known]
+    if unknown:
+        raise ValueError(f"Unknown artifact files: {', '.join(unknown)} (expected {', '.join(sorted(known))})")
+    if version is None:
+        digest = hashlib.sha1()
+        for path in sorted(files):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest.hexdigest()[:8]}"
+
+    os.makedirs(root, exist_ok=True)
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Artifact version already exists: {target}")
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for path in files:
+        shutil.copy2(path, staging)
+    # vérifie que la version se charge avant de la rendre visible
+    api.load_artifact_dir(staging)
+    os.rename(staging, target)
+
+    pointer = os.path.join(root, "CURRENT")
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+    print(f"Published artifacts {version} in {target}.")
+    return target
+
+
+def _run_worker(sock, log_level):
+    # le worker hérite des artefacts chargés par le parent (pages partagées en copy-on-write)
+    config = uvicorn.Config(api.app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def serve(host="127.0.0.1", port=8000, workers=None, log_level="info"):
+    '''
+    Charge les artefacts une seule fois puis forke les workers uvicorn, qui partagent le socket
+    d'écoute et, grâce au fork après chargement, les tableaux NumPy des poids et des embeddings.
+    Le parent relance un worker qui meurt et arrête proprement les workers sur SIGINT/SIGTERM
+    (les requêtes en cours se terminent). Les artefacts ne sont rechargés que par le parent : il
+    vérifie CURRENT toutes les ARTIFACTS_POLL_S secondes (SIGHUP force la vérification, SIGUSR1
+    recharge même si la version n'a pas changé), charge la nouvelle version, forke une nouvelle
+    génération de workers puis arrête l'ancienne. Les workers ne gardent ainsi jamais chacun leur
+    copie des poids : il n'y en a qu'une, partagée en copy-on-write (deux pendant la relève).
+    Chaque worker écrit ses métriques dans un dossier commun (API_METRICS_DIR) : /metrics renvoie
+    la somme de tous les workers, quel que soit celui qui reçoit la requête.
+    param host: adresse d'écoute
+    param port: port d'écoute
+    param workers: nombre de workers (par défaut le nombre de cœurs)
+    param log_level: niveau de log d'uvicorn
+    '''
+    workers = workers or os.cpu_count() or 1
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # les objets déjà chargés ne seront plus parcourus par le GC : leurs pages restent partagées
+    gc.collect()
+    gc.freeze()
+    os.environ["API_SERVE_PARENT_PID"] = str(os.getpid())
+    metrics_dir = tempfile.mkdtemp(prefix="api-metrics-")
+    api.METRICS_DIR = os.environ["API_METRICS_DIR"] = metrics_dir
+    # le chargement des artefacts est compté une fois, dans le fichier du parent
+    api.write_metrics_snapshot()
+
+    children = set()
+    retiring = set()
+    stopping = False
+    reload_requested = None
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR1):
+                signal.signal(signum, signal.SIG_DFL)
+            api.metrics.clear_counts()
+            code = 0
+            try:
+                _run_worker(sock, log_level)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children | retiring:
+            os.kill(pid, signal.SIGTERM)
+
+    def request_reload(signum, frame):
+        nonlocal reload_requested
+        reload_requested = "force" if signum == signal.SIGUSR1 else reload_requested or "changed"
+
+    def reload(force):
+        # une version illisible est ignorée (comme dans watch_artifacts) sans arrêter le superviseur
+        try:
+            artifact_dir = api.current_artifact_dir()
+            if artifact_dir is None or (not force and artifact_dir == api.artifacts.directory):
+                return False
+            bundle = api.load_artifact_dir(artifact_dir)
+        except Exception:
+            traceback.print_exc()
+            print(f"Artifact reload failed, keeping version {api.artifacts.version}.")
+            return False
+        # l'ancienne version est libérée avant de geler la nouvelle pour la génération suivante
+        gc.unfreeze()
+        api.install_bundle(bundle)
+        del bundle
+        gc.collect()
+        gc.freeze()
+        api.write_metrics_snapshot()
+        print(f"Artifacts reloaded from {artifact_dir} (version {api.artifacts.version}), replacing workers.")
+        return True
+
+    def replace_workers():
+        # les nouveaux workers acceptent déjà sur le socket partagé quand les anciens s'arrêtent
+        old = set(children)
+        children.clear()
+        for _ in range(workers):
+            spawn()
+        retiring.update(old)
+        for pid in old:
+            os.kill(pid, signal.SIGTERM)
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, request_reload)
+    signal.signal(signal.SIGUSR1, request_reload)
+    print(f"Serving {api.artifacts.version} on http://{host}:{port} with {workers} workers.")
+
+    last_check = time.monotonic()
+    while children or retiring:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            if pid in retiring:
+                retiring.discard(pid)
+            else:
+                children.discard(pid)
+                if not stopping:
+                    time.sleep(1)  # évite de relancer en boucle un worker qui plante au démarrage
+                    spawn()
+            continue
+        if not stopping and (reload_requested or time.monotonic() - last_check >= api.ARTIFACTS_POLL_S):
+            force, reload_requested = reload_requested == "force", None
+            last_check = time.monotonic()
+            if reload(force):
+                replace_workers()
+        time.sleep(0.1)
+    sock.close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers (run from the repository root).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="start the workers")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--workers", type=int, default=None)
+    serve_parser.add_argument("--log-level", default="info")
+    publish_parser = subparsers.add_parser("publish", help="publish a new artifact version and point CURRENT to it")
+    publish_parser.add_argument("files", nargs="+")
+    publish_parser.add_argument("--root", default=api.ARTIFACTS_ROOT)
+    publish_parser.add_argument("--version", default=None)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.log_level)
+    else:
+        publish(args.files, args.root, args.version)
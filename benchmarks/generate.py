@@ -0,0 +1,71 @@
+import argparse
+import json
+import random
+from pathlib import Path
+
+
+def load_hero_codes(heroes_path="data/heroes.json"):
+    with open(heroes_path, "r", encoding="utf-8") as f:
+        return list(json.load(f))
+
+
+def generate_battles(n_battles, hero_codes, seed=0, skew=1.1):
+    '''
+    Génère des matchs synthétiques au format de sortie de transformBattleData.
+    La popularité des héros suit une loi de Zipf (quelques héros très joués, une longue traîne),
+    ce qui donne des tailles de vocabulaire et des distributions proches des vraies données.
+    param n_battles: nombre de matchs
+    param hero_codes: codes des héros utilisables
+    param seed: graine du générateur, le même seed donne les mêmes matchs
+    param skew: exposant de la loi de Zipf
+    return: liste de dictionnaires de match
+    '''
+    rng = random.Random(seed)
+    codes = list(hero_codes)
+    rng.shuffle(codes)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(codes))]
+    battles = []
+    for _ in range(n_battles):
+        # 10 héros distincts, tirés selon leur popularité
+        picks = []
+        while len(picks) < 10:
+            hero = rng.choices(codes, weights)[0]
+            if hero not in picks:
+                picks.append(hero)
+        banned = (rng.randrange(5), rng.randrange(5))
+        battles.append({
+            "first_pick": rng.choice(("my_team", "enemy_team")),
+            "winner": rng.choice(("my_team", "enemy_team")),
+            "my_team": _team(picks[:5], banned[0], rng),
+            "enemy_team": _team(picks[5:], banned[1], rng)
+        })
+    return battles
+
+
+def _team(heroes, banned, rng):
+    return [
+        {
+            "pick_order": order + 1,
+            "hero_code": hero,
+            "artifact": f"efa{rng.randint(1, 60):02d}",
+            "equip": {"set": rng.sample(("set_speed", "set_acc", "set_cri", "set_def", "set_max_hp", "set_immune"), 2)},
+            "banned": int(order == banned)
+        }
+        for order, hero in enumerate(heroes)
+    ]
+
+
+def write_battles(battles, json_path):
+    Path(json_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(battles, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic battles in the transformBattleData format.")
+    parser.add_argument("n_battles", type=int)
+    parser.add_argument("output", help="JSON file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--heroes", default="data/heroes.json")
+    args = parser.parse_args()
+    write_battles(generate_battles(args.n_battles, load_hero_codes(args.heroes), args.seed), args.output)
@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "collect_process_data"))
+sys.path.insert(0, str(ROOT / "modele"))
+sys.path.insert(0, str(ROOT))
+
+from generate import generate_battles, load_hero_codes, write_battles
+
+
+def bench_prepare(n_battles, seed, repeat):
+    '''
+    Débit de load_and_prepare_data + encode sur un fichier de matchs synthétiques.
+    return: résultats, matrice X codée (réutilisée par les autres mesures)
+    '''
+    from prepare_data import load_and_prepare_data, encode
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "battles.json")
+        write_battles(generate_battles(n_battles, load_hero_codes(ROOT / "data/heroes.json"), seed), json_path)
+        load_times, encode_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = load_and_prepare_data(json_path)
+            load_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            X, y, vocab = encode(df)
+            encode_times.append(time.perf_counter() - start)
+    load_s, encode_s = min(load_times), min(encode_times)
+    return {
+        "battles": n_battles,
+        "load_battles_per_s": n_battles / load_s,
+        "encode_battles_per_s": n_battles / encode_s,
+        "total_battles_per_s": n_battles / (load_s + encode_s)
+    }, X, vocab
+
+
+def bench_prefixes(X, repeat):
+    from draft_data import expand_prefixes
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prefixes, _ = expand_prefixes(X, maxlen=10)
+        times.append(time.perf_counter() - start)
+    return {"samples": len(prefixes), "prefix_samples_per_s": len(prefixes) / min(times)}
+
+
+def bench_fit(X, vocab, vector_size, epochs, seed):
+    '''
+    Débit d'entraînement de modele2 (échantillons par seconde), hors première epoch (compilation du graphe).
+    Les embeddings sont tirés au hasard : seul le coût du pipeline et du modèle est mesuré.
+    '''
+    import tensorflow as tf
+    from draft_data import expand_prefixes
+    from modele2 import build_model, make_dataset
+
+    tf.keras.utils.set_random_seed(seed)
+    table = np.random.default_rng(seed).normal(size=(len(vocab), vector_size)).astype(np.float32)
+    table[0] = 0
+    prefixes, targets = expand_prefixes(X, maxlen=10)
+    dataset = make_dataset(prefixes, targets, table, batch_size=64, shuffle=True, seed=seed)
+    model = build_model(input_shape=(10, vector_size))
+    model.fit(dataset, epochs=1, verbose=0)
+    start = time.perf_counter()
+    model.fit(dataset, epochs=epochs, verbose=0)
+    elapsed = time.perf_counter() - start
+    return {"samples": len(prefixes), "epochs": epochs, "fit_samples_per_s": len(prefixes) * epochs / elapsed}
+
+
+async def _api_load(api, n_requests, concurrency, seed):
+    import httpx
+
+    rng = random.Random(seed)
+    codes = api.artifacts.hero_index.codes
+    drafts = [",".join(rng.sample(codes, rng.randint(1, 9))) for _ in range(n_requests)]
+    latencies = []
+
+    async def worker(client, queue):
+        while queue:
+            draft = queue.pop()
+            start = time.perf_counter()
+            response = await client.get("/next_pick/", params={"draft": draft})
+            latencies.append(time.perf_counter() - start)
+            if "error" in response.json():
+                raise RuntimeError(response.json()["error"])
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # quelques requêtes de chauffe, hors mesure
+        await worker(client, drafts[:concurrency])
+        latencies.clear()
+        queue = drafts[concurrency:]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, queue) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def bench_api(n_requests, concurrency, seed):
+    '''
+    Latence (p50/p95/p99) et débit de /next_pick/ sous charge concurrente, via un client ASGI en mémoire.
+    Le cache est vidé et les drafts sont tous différents : ce sont des requêtes froides.
+    '''
+    from API import api
+
+    api.cache.clear()
+    latencies, elapsed = asyncio.run(_api_load(api, n_requests + concurrency, concurrency, seed))
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "requests_per_s": len(latencies) / elapsed
+    }
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Compare chaque mesure à la référence : un débit (*_per_s) doit rester au-dessus de
+    baseline * (1 - tolerance), une latence (*_ms) en dessous de baseline * (1 + tolerance).
+    return: liste des régressions, tous les écarts relatifs
+    '''
+    regressions, changes = [], {}
+    for bench, values in results.items():
+        for metric, value in values.items():
+            reference = baseline.get(bench, {}).get(metric)
+            if not reference or not (metric.endswith("_per_s") or metric.endswith("_ms")):
+                continue
+            change = value / reference - 1
+            changes[f"{bench}.{metric}"] = change
+            if (metric.endswith("_per_s") and change < -tolerance) or (metric.endswith("_ms") and change > tolerance):
+                regressions.append(f"{bench}.{metric}: {reference:.4g} -> {value:.4g} ({change:+.1%})")
+    return regressions, changes
+
+
+def run(args):
+    results = {}
+    if "prepare" in args.only or "prefixes" in args.only or "fit" in args.only:
+        results["prepare"], X, vocab = bench_prepare(args.battles, args.seed, args.repeat)
+    if "prefixes" in args.only:
+        results["prefixes"] = bench_prefixes(X, args.repeat)
+    if "fit" in args.only:
+        try:
+            results["fit"] = bench_fit(X, vocab, args.vector_size, args.epochs, args.seed)
+        except ImportError as e:
+            print(f"Skipping fit benchmark: {e}")
+    if "api" in args.only:
+        results["api"] = bench_api(args.requests, args.concurrency, args.seed)
+    if "prepare" not in args.only:
+        results.pop("prepare", None)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the performance benchmarks (from the repository root).")
+    parser.add_argument("--battles", type=int, default=20000, help="synthetic battles for prepare/prefixes/fit")
+    parser.add_argument("--epochs", type=int, default=1, help="timed epochs for the fit benchmark")
+    parser.add_argument("--vector-size", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="API requests")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent API clients")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure, the best one is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", default=["prepare", "prefixes", "fit", "api"],
+                        choices=["prepare", "prefixes", "fit", "api"])
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--update-baseline", action="store_true", help="save these results as the new baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "update_baseline")},
+        "results": results
+    }
+
+    regressions = []
+    if Path(args.baseline).exists() and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions, report["changes"] = compare(results, baseline["results"], args.tolerance)
+        report["regressions"] = regressions
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def battle_key(battle):
+    """
+    Stable key of a transformed battle.
+
+    Battles keep the identifier of the raw battle_list entry (battle_seq) and the ids of
+    both players, so two distinct battles with the same drafts, gear and result (a rematch
+    between the same players) get different keys. The same battle fetched from both
+    players' histories has the same identifier and the same sorted pair of players.
+
+    Battles without an identifier fall back to a hash of their content, plus their date and
+    players when known (battles stored by an older crawler have neither): my_team/enemy_team
+    (and first_pick/winner) are swapped between the two histories, so the two teams are put
+    in a canonical order before hashing.
+
+    :param battle: battle dictionary returned by transformBattleData
+    :return: hexadecimal key
+    """
+    if battle.get("battle_seq") is not None:
+        players = sorted(str(player) for player in battle.get("players", []))
+        return hashlib.sha1("\x1f".join(("battle", str(battle["battle_seq"]), *players)).encode()).hexdigest()
+    sides = {
+        "my_team": json.dumps(battle.get("my_team", []), sort_keys=True),
+        "enemy_team": json.dumps(battle.get("enemy_team", []), sort_keys=True),
+    }
+    first_pick = sides.get(battle.get("first_pick"), "")
+    winner = sides.get(battle.get("winner"), "")
+    team_a, team_b = sorted(sides.values())
+    parts = [team_a, team_b, first_pick, winner]
+    if battle.get("battle_date") is not None or battle.get("players"):
+        parts += [str(battle.get("battle_date", "")), *sorted(str(player) for player in battle.get("players", []))]
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+
+class BattleStore:
+    """
+    Append-only SQLite store of transformed battles.
+
+    Battles are deduplicated on battle_key, so re-running a crawl or fetching the same
+    battle from both players only stores it once, and a checkpoint only writes the new
+    rows. The crawl progress of each (player, page) is kept to resume an interrupted crawl.
+
+    :param path: SQLite database file
+    """
+
+    def __init__(self, path="battle_data.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS battles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                battle_key TEXT NOT NULL UNIQUE,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS crawl_progress (
+                nick_no INTEGER NOT NULL,
+                world_code TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                battles INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (nick_no, world_code, page)
+            );
+        """)
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM battles").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _insert(self, battles):
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO battles (battle_key, data) VALUES (?, ?)",
+            ((battle_key(battle), json.dumps(battle)) for battle in battles)
+        )
+        return self.conn.total_changes - before
+
+    def add_battles(self, battles):
+        """
+        Append battles, skipping the ones already stored.
+
+        :param battles: list of battles returned by transformBattleData
+        :return: number of new battles
+        """
+        with self.conn:
+            return self._insert(battles)
+
+    def record_page(self, nick_no, world_code, page, battles):
+        """
+        Append the battles of one crawled page and mark the page as done, in one transaction.
+
+        :return: number of new battles
+        """
+        with self.conn:
+            added = self._insert(battles)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO crawl_progress VALUES (?, ?, ?, ?, ?)",
+                (nick_no, world_code, page, len(battles), time.time())
+            )
+        return added
+
+    def done_pages(self):
+        """
+        :return: set of (nick_no, world_code, page) already crawled
+        """
+        return set(self.conn.execute("SELECT nick_no, world_code, page FROM crawl_progress"))
+
+    def last_id(self):
+        """
+        :return: id of the most recently appended battle (0 if the store is empty)
+        """
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM battles").fetchone()[0]
+
+    def iter_battles(self, since_id=0, until_id=None, with_ids=False):
+        """
+        Iterate over the stored battles in insertion order.
+
+        :param since_id: only battles appended after this id
+        :param until_id: only battles up to this id (included)
+        :param with_ids: yield (id, battle) pairs instead of battles
+        :return: generator of battle dictionaries
+        """
+        if until_id is None:
+            until_id = self.last_id()
+        cursor = self.conn.execute("SELECT id, data FROM battles WHERE id > ? AND id <= ? ORDER BY id", (since_id, until_id))
+        for battle_id, data in cursor:
+            yield (battle_id, json.loads(data)) if with_ids else json.loads(data)
+
+    def import_json(self, json_path):
+        """
+        Import a battle_data.json file written by the previous version of the crawler.
+
+        :return: number of new battles
+        """
+        with open(json_path, "r", encoding="utf-8") as f:
+            return self.add_battles(json.load(f))
+
+    def export_json(self, json_path):
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.iter_battles()), f, indent=2)
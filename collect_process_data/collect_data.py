@@ -1,10 +1,87 @@
 import requests
+import asyncio
 import json
+import os
+import random
+import re
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.adapters import HTTPAdapter
+from battle_store import BattleStore
+from urllib.parse import parse_qsl, urlsplit
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # orjson.JSONDecodeError hérite de json.JSONDecodeError
+except ImportError:
+    _json_loads = json.loads
 
 
-def get_players_by_page(page: int, season_code="pvp_rta_ss18", world_code="all", lang="en"):
+BASE_URL = "https://epic7.onstove.com"
+SEASON_CODE = "pvp_rta_ss18"
+
+# erreurs HTTP pour lesquelles une nouvelle tentative a du sens
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# champs d'une entrée de battle_list qui identifient le match de façon unique (le premier présent est gardé),
+# date du match (pas unique : deux revanches le même jour), puis les joueurs des deux camps
+BATTLE_ID_FIELDS = ("battle_seq", "battle_id")
+BATTLE_DATE_FIELDS = ("battle_day", "battle_date")
+PLAYER_ID_FIELD = "nicknameno"
+ENEMY_ID_FIELDS = ("matchPlayerNicknameno", "enemy_nick_no")
+
+
+def make_session(pool_size=4):
+    """
+    Create a requests session that keeps its connections alive between calls.
+
+    :param pool_size: Number of pooled connections per host
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _record_name(endpoint, params):
+    """
+    File name under which a response is recorded / replayed.
+    """
+    key = "_".join(f"{k}={v}" for k, v in sorted(params.items()) if k != "lang")
+    return os.path.join(endpoint, f"{key}.json")
+
+def _post(endpoint, params, headers, session=None, base_url=BASE_URL, record_dir=None):
+    """
+    POST to an Epic7 game API endpoint and return the decoded JSON response.
+
+    :param endpoint: Endpoint name (e.g. "getBattleList")
+    :param params: Query parameters
+    :param headers: HTTP headers
+    :param session: requests.Session to reuse pooled connections (default = one-shot request)
+    :param base_url: Server to query (a local replay server for tests)
+    :param record_dir: If set, the raw response is also saved in this directory
+    :return: decoded JSON response
+    """
+    resp = (session or requests).post(f"{base_url}/gg/gameApi/{endpoint}", params=params, headers=headers, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+
+    if record_dir:
+        path = os.path.join(record_dir, _record_name(endpoint, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return data
+
+
+
+def get_players_by_page(page: int, season_code=SEASON_CODE, world_code="all", lang="en",
+                        session=None, base_url=BASE_URL, record_dir=None):
     """
     Fetch 10 players from the Epic7 ranking API for a specific page.
     
@@ -12,10 +89,11 @@ def get_players_by_page(page: int, season_code="pvp_rta_ss18", world_code="all",
     :param season_code: Season code (default = current RTA season)
     :param world_code: Server code ("all", "world_eu", "world_asia", "world_kor", "world_global")
     :param lang: Language ("en", "fr", etc.)
+    :param session: requests.Session to reuse (default = new connection)
+    :param base_url: Server to query
+    :param record_dir: Directory where the raw response is saved (optional)
     :return: list of player dictionaries
     """
-    URL = "https://epic7.onstove.com/gg/gameApi/getWorldUserRankingDetail"
-
     params = {
         "season_code": season_code,
         "world_code": world_code,
@@ -31,13 +109,11 @@ def get_players_by_page(page: int, season_code="pvp_rta_ss18", world_code="all",
         "Accept": "application/json, text/javascript, */*; q=0.01",
     }
 
-    resp = requests.post(URL, params=params, headers=headers, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    data = _post("getWorldUserRankingDetail", params, headers, session, base_url, record_dir)
 
     return data.get("result_body", [])
 
-def getBattlePlayer(nick_no, world_code, page=1, lang="en"):
+def getBattlePlayer(nick_no, world_code, page=1, lang="en", session=None, base_url=BASE_URL, record_dir=None):
     """
     Fetch detailed battle player information from the Epic7 API.
     
@@ -45,10 +121,11 @@ def getBattlePlayer(nick_no, world_code, page=1, lang="en"):
     :param world_code: Server code
     :param page: Page number for additional data (default = 1)
     :param lang: Language ("en", "fr", etc.)
+    :param session: requests.Session to reuse (default = new connection)
+    :param base_url: Server to query
+    :param record_dir: Directory where the raw response is saved (optional)
     :return: Player detail dictionary
     """
-    URL = "https://epic7.onstove.com/gg/gameApi/getBattleList"
-
     params = {
         "nick_no": nick_no,
         "world_code": world_code,
@@ -64,113 +141,213 @@ def getBattlePlayer(nick_no, world_code, page=1, lang="en"):
         "Accept": "application/json, text/javascript, */*; q=0.01",
     }
 
-    resp = requests.post(URL, params=params, headers=headers, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    data = _post("getBattleList", params, headers, session, base_url, record_dir)
 
     return data.get("result_body", {})
 
-def transformBattleData(battle_data):
+def _parse_team(team_info_str, deck, counters, kind):
+    """
+    Parse the teamBettleInfo string of one side and attach the ban flag from its deck.
+    Problems are counted in `counters` under "missing_<kind>" / "invalid_<kind>".
+    """
+    if not team_info_str:
+        counters[f"missing_{kind}"] += 1
+        return []
+    try:
+        team_info = _json_loads("{" + team_info_str + "}")
+    except json.JSONDecodeError:
+        counters[f"invalid_{kind}"] += 1
+        return []
+
+    hero_list = deck.get("hero_list", []) if deck else []
+    listed = len(hero_list)
+    return [
+        {
+            "pick_order": hero["pick_order"],
+            "hero_code": hero["hero_code"],
+            "artifact": hero["artifact"],
+            "equip": hero["equip"],
+            "banned": hero_list[hero["pick_order"] - 1].get("ban", 0) if listed >= hero["pick_order"] else 0
+        }
+        for hero in team_info.get("my_team", [])
+    ]
+
+def _battle_identity(battle, nick_no=None):
+    """
+    Unique identifier of a raw battle_list entry (None if it has none), its date (None if
+    missing) and the sorted ids of both players (empty when one of them is unknown).
+    Used by battle_store.battle_key.
+    """
+    first = lambda fields: next((battle[field] for field in fields if battle.get(field) not in (None, "")), None)
+    player = battle.get(PLAYER_ID_FIELD) or nick_no
+    enemy = first(ENEMY_ID_FIELDS)
+    players = sorted(str(p) for p in (player, enemy)) if player and enemy else []
+    return first(BATTLE_ID_FIELDS), first(BATTLE_DATE_FIELDS), players
+
+def transformBattleData(battle_data, counters=None, nick_no=None):
     """
     Return a simplified JSON with only the relevant fields:
     pick_order, hero_code, artifact, and equip for both teams
-    for all battles in battle_list.
+    for all battles in battle_list, plus the battle identifier (battle_seq), its date
+    (battle_date) and the ids of both players, which deduplicate the battle in the BattleStore.
+
+    :param battle_data: result_body of a getBattleList response
+    :param counters: collections.Counter updated with the number of battles and of
+                     missing/invalid fields (optional)
+    :param nick_no: Player whose history was fetched, when the entries do not carry it
+    :return: list of battle dictionaries
     """
+    if counters is None:
+        counters = Counter()
     results = []
 
     for battle in battle_data.get("battle_list", []):
         result = {}
 
-        teamBattleInfo_str = battle.get("teamBettleInfo")
-        teamBattleInfoenemy_str = battle.get("teamBettleInfoenemy")
         mydeck = battle.get("my_deck")
         enemydeck = battle.get("enemy_deck")
 
         # Determine first pick
         if mydeck and enemydeck:
-            if(len(mydeck.get("hero_list", [])) == 0 or len(enemydeck.get("hero_list", [])) == 0):
+            my_heroes = mydeck.get("hero_list", [])
+            enemy_heroes = enemydeck.get("hero_list", [])
+            if len(my_heroes) == 0 or len(enemy_heroes) == 0:
+                counters["empty_deck"] += 1
                 break
-            if mydeck['hero_list'][0].get("first_pick") == 1:
+            if my_heroes[0].get("first_pick") == 1:
                 result["first_pick"] = "my_team"
-            elif enemydeck['hero_list'][0].get("first_pick") == 1:
+            elif enemy_heroes[0].get("first_pick") == 1:
                 result["first_pick"] = "enemy_team"
             else:
                 result["first_pick"] = "unknown"
+                counters["unknown_first_pick"] += 1
 
         # Determine winner
-        if battle.get("iswin") == 1:
+        iswin = battle.get("iswin")
+        if iswin == 1:
             result["winner"] = "my_team"
-        elif battle.get("iswin") == 2:
+        elif iswin == 2:
             result["winner"] = "enemy_team"
         else:
             result["winner"] = "unknown"
+            counters["unknown_winner"] += 1
 
-        # Parse my team info
-        if teamBattleInfo_str:
-            try:
-                teamBattleInfo = json.loads("{" + teamBattleInfo_str + "}")
-                result["my_team"] = [
-                    {
-                        "pick_order": hero["pick_order"],
-                        "hero_code": hero["hero_code"],
-                        "artifact": hero["artifact"],
-                        "equip": hero["equip"],
-                        "banned": (
-                            mydeck["hero_list"][hero["pick_order"] - 1].get("ban", 0)
-                            if mydeck and "hero_list" in mydeck and len(mydeck["hero_list"]) >= hero["pick_order"]
-                            else 0
-                        )
-                    }
-                    for hero in teamBattleInfo.get("my_team", [])
-                ]
-            except json.JSONDecodeError as e:
-                print("Error parsing teamBettleInfo:", e)
-                result["my_team"] = []
+        battle_seq, battle_date, players = _battle_identity(battle, nick_no)
+        if battle_seq is None:
+            counters["missing_battle_id"] += 1
         else:
-            print("No teamBattleInfo data found.")
-            result["my_team"] = []
-
-        # Parse enemy team info
-        if teamBattleInfoenemy_str:
-            try:
-                teamBattleInfoenemy = json.loads("{" + teamBattleInfoenemy_str + "}")
-                result["enemy_team"] = [
-                    {
-                        "pick_order": hero["pick_order"],
-                        "hero_code": hero["hero_code"],
-                        "artifact": hero["artifact"],
-                        "equip": hero["equip"],
-                        "banned": (
-                            enemydeck["hero_list"][hero["pick_order"] - 1].get("ban", 0)
-                            if enemydeck and "hero_list" in enemydeck and len(enemydeck["hero_list"]) >= hero["pick_order"]
-                            else 0
-                        )
-                    }
-                    for hero in teamBattleInfoenemy.get("my_team", [])
-                ]
-            except json.JSONDecodeError as e:
-                print("Error parsing teamBettleInfoenemy:", e)
-                result["enemy_team"] = []
-        else:
-            print("No teamBattleInfoenemy data found.")
-            result["enemy_team"] = []
+            result["battle_seq"] = battle_seq
+        if battle_date is not None:
+            result["battle_date"] = battle_date
+        if players:
+            result["players"] = players
+
+        # Parse both teams
+        result["my_team"] = _parse_team(battle.get("teamBettleInfo"), mydeck, counters, "team_info")
+        result["enemy_team"] = _parse_team(battle.get("teamBettleInfoenemy"), enemydeck, counters, "enemy_team_info")
 
         results.append(result)
 
+    counters["battles"] += len(results)
     return results
 
-def getBattleData(all_players, first_page=1, number_of_pages=3):
-    all_battle_data = []
-
-    # Load existing data if available
+def _record_params(path):
+    """
+    Query parameters of a recorded response, read back from its file name (see _record_name).
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return dict(re.findall(r"(?:^|_)([a-z_]+?)=(.*?)(?=_[a-z_]+=|$)", name))
+
+def _transform_raw_page(path, season_code=SEASON_CODE):
+    counters = Counter()
+    with open(path, "rb") as f:
+        data = _json_loads(f.read())
+    params = _record_params(path)
+    battles = transformBattleData(data.get("result_body", data), counters, params.get("nick_no"))
+    if params.get("world_code"):
+        tagBattles(battles, season_code, params["world_code"])
+    else:
+        counters["missing_world_code"] += 1
+    return battles, counters
+
+def retransformRawPages(raw_dir, workers=None, store_path=None, season_code=SEASON_CODE):
+    """
+    Re-run transformBattleData on a directory of raw getBattleList responses (as saved
+    with record_dir), parsing the files in parallel across a process pool.
+    Battles are tagged like the crawlers do: the player and server come from the
+    recorded file name, the season from season_code.
+
+    :param raw_dir: Directory of raw responses (a record_dir or its getBattleList folder)
+    :param workers: Number of processes (default = number of cores)
+    :param store_path: If set, battles are appended to this BattleStore instead of returned
+    :param season_code: Season the recorded pages were crawled in
+    :return: (list of battles, or number of new battles when store_path is set; Counter of parsing events)
+    """
+    battle_dir = os.path.join(raw_dir, "getBattleList")
+    if not os.path.isdir(battle_dir):
+        battle_dir = raw_dir
+    paths = sorted(os.path.join(battle_dir, name) for name in os.listdir(battle_dir) if name.endswith(".json"))
+
+    workers = workers or os.cpu_count()
+    store = BattleStore(store_path) if store_path else None
+    battles = []
+    added = 0
+    counters = Counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    transform = partial(_transform_raw_page, season_code=season_code)
+    pages = (pool.map(transform, paths, chunksize=max(1, len(paths) // (workers * 4)))
+             if pool else map(transform, paths))
     try:
-        with open("battle_data.json", "r") as f:
-            all_battle_data = json.load(f)
-            print(f"Loaded {len(all_battle_data)} battles from existing file.")
-    except FileNotFoundError:
-        print("No existing battle data file found, fetching data from API.")
+        for page_battles, page_counters in pages:
+            counters.update(page_counters)
+            if store is not None:
+                added += store.add_battles(page_battles)
+            else:
+                battles.extend(page_battles)
+    finally:
+        if pool:
+            pool.shutdown()
+    counters["files"] = len(paths)
+
+    if store is not None:
+        store.close()
+        return added, counters
+    return battles, counters
+
+def tagBattles(battles, season_code, world_code):
+    """
+    Tag transformed battles with the season and server they were crawled from, which
+    partition the columnar feature store (feature_store.py). The tags are not part of
+    battle_key, so tagged and untagged copies of a battle are still deduplicated.
+
+    :param battles: list of battles returned by transformBattleData
+    :param season_code: Season of the crawl
+    :param world_code: Server of the player whose history was fetched
+    :return: the same list
+    """
+    for battle in battles:
+        battle["season_code"] = season_code
+        battle["world_code"] = world_code
+    return battles
 
-    total_fetched = len(all_battle_data)
+def getBattleData(all_players, first_page=1, number_of_pages=3, store_path="battle_data.sqlite", resume=True,
+                  season_code=SEASON_CODE):
+    """
+    Crawl the battle pages of each player and append the new battles to a BattleStore.
+
+    :param all_players: list of player dictionaries (nick_no, world_code)
+    :param first_page: First battle page fetched for each player
+    :param number_of_pages: Number of battle pages fetched for each player
+    :param store_path: SQLite file of the BattleStore
+    :param resume: Skip the (player, page) already crawled by a previous run
+    :param season_code: Season the battles are tagged with
+    """
+    store = BattleStore(store_path)
+    print(f"Loaded {len(store)} battles from existing store.")
+    done_pages = store.done_pages() if resume else set()
+
+    total_fetched = len(store)
+    counters = Counter()
 
     for player_index, player in enumerate(all_players, start=1):
         nick_no = player.get("nick_no")
@@ -182,14 +359,17 @@ def getBattleData(all_players, first_page=1, number_of_pages=3):
         print(f"\n=== Processing player {player_index}/{len(all_players)} (nick_no={nick_no}) ===")
 
         for page in range(first_page, first_page + number_of_pages):
+            if (nick_no, world_code, page) in done_pages:
+                print(f"Page {page} already crawled for {nick_no}, skipping.")
+                continue
             success = False
             while not success:
                 try:
                     battle_data = getBattlePlayer(nick_no, world_code, page)
-                    transformed_data = transformBattleData(battle_data)
-                    all_battle_data.extend(transformed_data)
-                    total_fetched += len(transformed_data)
-                    print(f"Page {page} done for {nick_no}. Total battles so far: {total_fetched}")
+                    transformed_data = tagBattles(transformBattleData(battle_data, counters, nick_no), season_code, world_code)
+                    added = store.record_page(nick_no, world_code, page, transformed_data)
+                    total_fetched += added
+                    print(f"Page {page} done for {nick_no} ({added} new, {len(transformed_data) - added} duplicates). Total battles so far: {total_fetched}")
                     success = True
                     time.sleep(2)  # Be polite to the server
 
@@ -201,17 +381,207 @@ def getBattleData(all_players, first_page=1, number_of_pages=3):
                     print(f"[Network error] {e}. Waiting 2 minutes before retry...")
                     time.sleep(120)
 
-        # Save progress after each player
-        with open("battle_data.json", "w") as f:
-            json.dump(all_battle_data, f, indent=2)
-        print(f"Progress saved after player {nick_no} ({len(all_battle_data)} total battles).")
+    print(f"Done. {len(store)} battles in '{store_path}'. Parsing summary: {dict(counters)}")
+    store.close()
+
+class TokenBucket:
+    """
+    Global rate limit shared by every crawl task: `rate` requests per second on average,
+    with bursts of at most `capacity` requests.
+    """
+
+    def __init__(self, rate=2.0, capacity=4):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def _fetch_with_backoff(fetch, *args, sessions, rate_limiter, max_retries=6, base_delay=2.0, max_delay=120.0, **kwargs):
+    """
+    Run a blocking API call in a worker thread, behind the global rate limit.
+    Timeouts, connection errors and 429/5xx answers are retried with exponential backoff
+    and full jitter; other HTTP errors are raised immediately.
+
+    :param fetch: API function (get_players_by_page, getBattlePlayer)
+    :param sessions: asyncio.Queue of pooled requests sessions
+    :param rate_limiter: TokenBucket shared by the whole crawl
+    :param max_retries: Number of retries before giving up
+    :param base_delay: Backoff delay of the first retry, in seconds
+    :param max_delay: Upper bound of the backoff delay, in seconds
+    :return: result of fetch
+    """
+    for attempt in range(max_retries + 1):
+        await rate_limiter.acquire()
+        session = await sessions.get()
+        try:
+            return await asyncio.to_thread(fetch, *args, session=session, **kwargs)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                raise
+            error = e
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if attempt == max_retries:
+                raise
+            error = e
+        finally:
+            sessions.put_nowait(session)
+
+        delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        print(f"[Retry {attempt + 1}/{max_retries}] {error}. Waiting {delay:.1f}s...")
+        await asyncio.sleep(delay)
+
+def _crawl_resources(concurrency, rate, burst):
+    sessions = asyncio.Queue()
+    for _ in range(concurrency):
+        sessions.put_nowait(make_session(pool_size=1))
+    return sessions, TokenBucket(rate, burst)
+
+def _close_sessions(sessions):
+    while not sessions.empty():
+        sessions.get_nowait().close()
+
+async def getTopPlayersAsync(pages=10, concurrency=4, rate=2.0, burst=4, base_url=BASE_URL, record_dir=None, **kwargs):
+    """
+    Fetch the ranking pages concurrently (10 players per page).
+
+    :param pages: Number of ranking pages (10 = top 100)
+    :param concurrency: Maximum number of requests in flight
+    :param rate: Average number of requests per second
+    :param burst: Maximum burst of requests above the average rate
+    :param base_url: Server to query
+    :param record_dir: Directory where raw responses are saved (optional)
+    :return: list of player dictionaries, in ranking order
+    """
+    sessions, rate_limiter = _crawl_resources(concurrency, rate, burst)
+    try:
+        results = await asyncio.gather(*(
+            _fetch_with_backoff(get_players_by_page, page, sessions=sessions, rate_limiter=rate_limiter,
+                                base_url=base_url, record_dir=record_dir, **kwargs)
+            for page in range(1, pages + 1)
+        ))
+    finally:
+        _close_sessions(sessions)
+    return [player for players in results for player in players]
+
+async def getBattleDataAsync(all_players, first_page=1, number_of_pages=3, concurrency=8, rate=2.0, burst=4,
+                             base_url=BASE_URL, record_dir=None, store_path="battle_data.sqlite", resume=True,
+                             season_code=SEASON_CODE):
+    """
+    Concurrent version of getBattleData: players are crawled in parallel (at most
+    `concurrency` at a time) over pooled connections, all requests share one token-bucket
+    rate limit and failed requests back off on their own instead of stalling the crawl.
+
+    :param all_players: list of player dictionaries (nick_no, world_code)
+    :param first_page: First battle page fetched for each player
+    :param number_of_pages: Number of battle pages fetched for each player
+    :param concurrency: Maximum number of requests in flight
+    :param rate: Average number of requests per second (politeness budget)
+    :param burst: Maximum burst of requests above the average rate
+    :param base_url: Server to query (a local replay server for tests)
+    :param record_dir: Directory where raw responses are saved (optional)
+    :param store_path: SQLite file of the BattleStore
+    :param resume: Skip the (player, page) already crawled by a previous run
+    :param season_code: Season the battles are tagged with
+    :return: number of new battles
+    """
+    store = BattleStore(store_path)
+    print(f"Loaded {len(store)} battles from existing store.")
+    done_pages = store.done_pages() if resume else set()
+
+    sessions, rate_limiter = _crawl_resources(concurrency, rate, burst)
+    players = asyncio.Semaphore(concurrency)
+    counters = Counter()
 
-    # Final save
-    with open("battle_data.json", "w") as f:
-        json.dump(all_battle_data, f, indent=2)
-    print(f"Done. Saved {len(all_battle_data)} battles in 'battle_data.json'.")
+    async def crawl_player(player):
+        nick_no = player.get("nick_no")
+        world_code = player.get("world_code")
+        added = 0
+        async with players:
+            for page in range(first_page, first_page + number_of_pages):
+                if (nick_no, world_code, page) in done_pages:
+                    continue
+                try:
+                    battle_data = await _fetch_with_backoff(
+                        getBattlePlayer, nick_no, world_code, page, sessions=sessions, rate_limiter=rate_limiter,
+                        base_url=base_url, record_dir=record_dir
+                    )
+                except requests.exceptions.RequestException as e:
+                    print(f"[Failed] Player {nick_no}, page {page}: {e}. Skipping page.")
+                    continue
+                # seule la boucle d'événements écrit dans le store
+                battles = tagBattles(transformBattleData(battle_data, counters, nick_no), season_code, world_code)
+                added += store.record_page(nick_no, world_code, page, battles)
+        return nick_no, added
+
+    valid_players = []
+    for player in all_players:
+        if player.get("nick_no") and player.get("world_code"):
+            valid_players.append(player)
+        else:
+            print(f"Skipping player with missing nick_no or world_code: {player}")
+
+    total_added = 0
+    try:
+        tasks = [crawl_player(player) for player in valid_players]
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            nick_no, added = await task
+            total_added += added
+            print(f"Player {done}/{len(valid_players)} done (nick_no={nick_no}, {added} new battles).")
+    finally:
+        _close_sessions(sessions)
+        print(f"Done. {total_added} new battles, {len(store)} battles in '{store_path}'. Parsing summary: {dict(counters)}")
+        store.close()
+    return total_added
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.rsplit("/", 1)[-1]
+        path = os.path.join(self.server.record_dir, _record_name(endpoint, dict(parse_qsl(url.query))))
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.send_error(404, f"No recorded response for {endpoint} {url.query}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_recorded_responses(record_dir, host="127.0.0.1", port=0):
+    """
+    Start a local stand-in for the Epic7 API that replays the responses saved with record_dir.
+    The server runs in a daemon thread; pass its base_url to the crawl functions and call
+    server.shutdown() when done.
+
+    :param record_dir: Directory filled by a crawl with record_dir set
+    :param host: Interface to listen on
+    :param port: Port to listen on (0 = any free port)
+    :return: (server, base_url)
+    """
+    server = ThreadingHTTPServer((host, port), _ReplayHandler)
+    server.record_dir = record_dir
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
 
-def getHeroNames(page=1, grade_code="master", season_code="pvp_rta_ss18", lang="en"):
+def getHeroNames(page=1, grade_code="master", season_code=SEASON_CODE, lang="en"):
     URL = "https://epic7.onstove.com/gg/gameApi/getPopularHero"
     params = {
         "season_code": season_code,
@@ -0,0 +1,23 @@
+# ordre du draft, dans un module sans dépendance pour que l'API et modele/evaluate.py l'importent sans pandas ni gensim
+
+# picks alternés selon l'ordre de draft, indexés par l'équipe qui a le first pick
+DRAFT_ORDERS = {
+    "my_team": (
+        ("my_team", 0), ("enemy_team", 0),
+        ("enemy_team", 1), ("my_team", 1),
+        ("my_team", 2), ("enemy_team", 2),
+        ("enemy_team", 3), ("my_team", 3),
+        ("my_team", 4), ("enemy_team", 4)
+    ),
+    "enemy_team": (
+        ("enemy_team", 0), ("my_team", 0),
+        ("my_team", 1), ("enemy_team", 1),
+        ("enemy_team", 2), ("my_team", 2),
+        ("my_team", 3), ("enemy_team", 3),
+        ("enemy_team", 4), ("my_team", 4)
+    ),
+}
+
+# slots du draft joués par l'équipe qui a le first pick, puis par l'autre
+FIRST_PICK_SLOTS = tuple(slot for slot, (team, _) in enumerate(DRAFT_ORDERS["my_team"]) if team == "my_team")
+SECOND_PICK_SLOTS = tuple(slot for slot, (team, _) in enumerate(DRAFT_ORDERS["my_team"]) if team == "enemy_team")
@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from battle_store import BattleStore
+from draft_order import DRAFT_ORDERS, FIRST_PICK_SLOTS
+from prepare_data import PAD_CODE, PICK_COLUMNS
+
+UNKNOWN_PARTITION = "unknown"
+
+# column -> (dtype, width); hero/artifact/equip columns are dictionary-encoded
+COLUMNS = {
+    "battle_id": (np.int64, None),
+    "picks": (np.int16, 10),
+    "result": (np.int8, None),
+    "first_pick": (np.int8, None),
+    "bans": (np.int16, 2),
+    "artifacts": (np.int32, 10),
+    "equips": (np.int32, 10),
+}
+# dictionary of each encoded column
+DICTIONARIES = {"picks": "heroes", "bans": "heroes", "artifacts": "artifacts", "equips": "equips"}
+
+
+class FeatureStore:
+    """
+    Columnar store of transformed battles, partitioned by season and server.
+
+    Each partition directory (season=<season_code>/world=<world_code>) holds immutable
+    shards, one directory per write. A shard stores one .npy file per column, read with
+    mmap_mode="r", so a query only reads the partitions and columns it asks for:
+
+    - picks: (n, 10) hero indices in draft order, result: 1 if the first-pick side won,
+    - first_pick: 0 if my_team had the first pick, 1 if enemy_team did,
+    - bans: (n, 2) hero banned from the first-pick / second-pick side (0 if none),
+    - artifacts, equips: (n, 10) dictionary-encoded artifact codes and equip JSON, in draft order,
+    - battle_id: id of the battle in the BattleStore it was built from.
+
+    Hero, artifact and equip dictionaries are append-only JSON lists kept at the store root
+    (index 0 is padding). Each shard also keeps a hero presence mask, so hero predicates
+    skip shards that cannot match without reading their columns.
+
+    :param root: store directory
+    """
+
+    def __init__(self, root="data/features"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dictionaries = {name: self._load_json(f"{name}.json", [PAD_CODE]) for name in set(DICTIONARIES.values())}
+        self.state = self._load_json("state.json", {"last_battle_id": 0, "shards": 0})
+
+    def _load_json(self, name, default):
+        path = self.root / name
+        if not path.exists():
+            return default
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_json(self, name, value):
+        tmp = self.root / f"{name}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, self.root / name)
+
+    def _encoder(self, name):
+        values = self.dictionaries[name]
+        index = {value: i for i, value in enumerate(values)}
+
+        def encode(value):
+            if value not in index:
+                index[value] = len(values)
+                values.append(value)
+            return index[value]
+        return encode
+
+    def write(self, battles, battle_ids=None):
+        """
+        Append battles, one new shard per (season, world) partition.
+
+        :param battles: battles returned by transformBattleData (tagged by tagBattles, otherwise
+                        they go to the "unknown" partition)
+        :param battle_ids: BattleStore ids of the battles (optional)
+        :return: number of battles written (incomplete battles are skipped and counted in
+                 state["skipped"])
+        """
+        heroes, artifacts, equips = self._encoder("heroes"), self._encoder("artifacts"), self._encoder("equips")
+        partitions = {}
+        for n, battle in enumerate(battles):
+            # checked before any encoder call: a skipped battle never extends the dictionaries
+            first_pick = battle.get("first_pick")
+            if first_pick not in DRAFT_ORDERS or not all(
+                    len(battle.get(team) or ()) == len(FIRST_PICK_SLOTS)
+                    and all(isinstance(h, dict) and h.get("hero_code") for h in battle[team])
+                    for team in DRAFT_ORDERS):
+                self.state["skipped"] = self.state.get("skipped", 0) + 1
+                continue
+            order = DRAFT_ORDERS[first_pick]
+            second_pick = "enemy_team" if first_pick == "my_team" else "my_team"
+            slots = [battle[team][idx] for team, idx in order]
+            bans = [next((heroes(h["hero_code"]) for h in battle[team] if h.get("banned")), 0)
+                    for team in (first_pick, second_pick)]
+            row = {
+                "battle_id": battle_ids[n] if battle_ids is not None else 0,
+                "picks": [heroes(h["hero_code"]) for h in slots],
+                "result": int(battle.get("winner") == first_pick),
+                "first_pick": int(first_pick == "enemy_team"),
+                "bans": bans,
+                "artifacts": [artifacts(h.get("artifact") or "") for h in slots],
+                "equips": [equips(json.dumps(h.get("equip"), sort_keys=True)) for h in slots],
+            }
+            key = (battle.get("season_code") or UNKNOWN_PARTITION, battle.get("world_code") or UNKNOWN_PARTITION)
+            partitions.setdefault(key, []).append(row)
+
+        if len(self.dictionaries["heroes"]) > np.iinfo(np.int16).max:
+            raise ValueError(f"Too many heroes for int16 indices: {len(self.dictionaries['heroes'])}")
+        # dictionaries first: a shard never refers to a code missing from them
+        for name, values in self.dictionaries.items():
+            self._save_json(f"{name}.json", values)
+        for (season, world), rows in partitions.items():
+            self._write_shard(season, world, rows)
+        self._save_json("state.json", self.state)
+        return sum(len(rows) for rows in partitions.values())
+
+    def _write_shard(self, season, world, rows):
+        partition = self.root / f"season={season}" / f"world={world}"
+        shard = partition / f"part-{self.state['shards']:06d}"
+        staging = partition / f".{shard.name}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        for column, (dtype, width) in COLUMNS.items():
+            np.save(staging / f"{column}.npy", np.array([row[column] for row in rows], dtype=dtype))
+        present = np.zeros(len(self.dictionaries["heroes"]), dtype=bool)
+        present[np.array([row["picks"] for row in rows]).ravel()] = True
+        np.save(staging / "heroes_present.npy", present)
+        os.rename(staging, shard)
+        self.state["shards"] += 1
+
+    def update_from(self, store_path):
+        """
+        Append the battles added to a BattleStore since the last update.
+
+        :param store_path: SQLite file of the BattleStore
+        :return: number of battles written
+        """
+        with BattleStore(store_path) as store:
+            last_id = store.last_id()
+            pairs = list(store.iter_battles(self.state["last_battle_id"], last_id, with_ids=True))
+        written = self.write([battle for _, battle in pairs], [battle_id for battle_id, _ in pairs]) if pairs else 0
+        self.state["last_battle_id"] = last_id
+        self._save_json("state.json", self.state)
+        return written
+
+    def partitions(self, seasons=None, worlds=None):
+        """
+        Shards of the partitions matching the season/world filters (partition pruning).
+
+        :return: list of (season, world, shard directory)
+        """
+        shards = []
+        for season_dir in sorted(self.root.glob("season=*")):
+            season = season_dir.name.split("=", 1)[1]
+            if seasons is not None and season not in seasons:
+                continue
+            for world_dir in sorted(season_dir.glob("world=*")):
+                world = world_dir.name.split("=", 1)[1]
+                if worlds is not None and world not in worlds:
+                    continue
+                shards.extend((season, world, shard) for shard in sorted(world_dir.glob("part-*")))
+        return shards
+
+    def scan(self, columns=("picks", "result"), seasons=None, worlds=None, heroes=None, min_battle_id=0):
+        """
+        Read the given columns of the battles matching every filter.
+
+        :param columns: columns to read (see COLUMNS), plus "season" and "world"
+        :param seasons: season codes to keep (default: all)
+        :param worlds: world codes to keep (default: all)
+        :param heroes: hero codes that must all be picked in the battle
+        :param min_battle_id: only battles with a larger BattleStore id
+        :return: dictionary column -> array, rows in the same order in every column
+        """
+        hero_rows = []
+        if heroes:
+            index = {code: i for i, code in enumerate(self.dictionaries["heroes"])}
+            if any(code not in index for code in heroes):
+                hero_rows = None
+            else:
+                hero_rows = [index[code] for code in heroes]
+
+        parts = {column: [] for column in columns}
+        if hero_rows is not None:
+            for season, world, shard in self.partitions(seasons, worlds):
+                if hero_rows:
+                    present = np.load(shard / "heroes_present.npy", mmap_mode="r")
+                    if any(row >= len(present) or not present[row] for row in hero_rows):
+                        continue
+                mask = None
+                if hero_rows:
+                    picks = np.load(shard / "picks.npy", mmap_mode="r")
+                    mask = np.all([(picks == row).any(axis=1) for row in hero_rows], axis=0)
+                if min_battle_id:
+                    ids = np.load(shard / "battle_id.npy", mmap_mode="r")
+                    mask = ids > min_battle_id if mask is None else mask & (ids > min_battle_id)
+                if mask is not None and not mask.any():
+                    continue
+                for column in columns:
+                    if column in ("season", "world"):
+                        n = int(mask.sum()) if mask is not None else len(np.load(shard / "result.npy", mmap_mode="r"))
+                        parts[column].append(np.full(n, season if column == "season" else world, dtype=object))
+                        continue
+                    values = np.load(shard / f"{column}.npy", mmap_mode="r")
+                    parts[column].append(np.asarray(values[mask] if mask is not None else values))
+
+        result = {}
+        for column in columns:
+            if parts[column]:
+                result[column] = np.concatenate(parts[column])
+            elif column in ("season", "world"):
+                result[column] = np.empty(0, dtype=object)
+            else:
+                dtype, width = COLUMNS[column]
+                result[column] = np.empty((0, width) if width else 0, dtype=dtype)
+        return result
+
+    def decode(self, column, values):
+        """
+        Replace the dictionary indices of an encoded column by their codes.
+        """
+        return np.array(self.dictionaries[DICTIONARIES[column]], dtype=object)[values]
+
+    def encode_picks(self, picks, vocab):
+        """
+        Re-encode pick indices with another vocabulary (the one of prepare_data/Word2Vec).
+
+        :param picks: (n, 10) indices in the store's hero dictionary
+        :param vocab: list of hero codes
+        :return: (n, 10) int16 indices in vocab, -1 for heroes missing from it
+        """
+        index = {code: i for i, code in enumerate(vocab)}
+        lookup = np.array([index.get(code, -1) for code in self.dictionaries["heroes"]], dtype=np.int16)
+        return lookup[picks]
+
+    def to_frame(self, seasons=None, worlds=None, heroes=None):
+        """
+        Same DataFrame as prepare_data.load_and_prepare_data (pick_1..pick_10 and result).
+        """
+        data = self.scan(("picks", "result"), seasons, worlds, heroes)
+        df = pd.DataFrame(self.decode("picks", data["picks"]), columns=PICK_COLUMNS)
+        df["result"] = data["result"].astype(np.int64)
+        return df
+
+
+if __name__ == "__main__":
+    store = FeatureStore("data/features")
+    written = store.update_from("data/battle_data.sqlite")
+    print(f"{written} battles written, {len(store.partitions())} shards in {store.root}.")
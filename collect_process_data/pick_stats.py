@@ -0,0 +1,120 @@
+import numpy as np
+from pathlib import Path
+from prepare_data import PICK_COLUMNS, PAD_CODE, load_and_prepare_data, encode
+from battle_store import BattleStore
+from draft_order import FIRST_PICK_SLOTS, SECOND_PICK_SLOTS
+
+
+def _pair_counts(X, pairs, size):
+    '''
+    Compte les paires (héros du slot i, héros du slot j) pour une liste de paires de slots.
+    Une seule passe de bincount sur les index aplatis a * size + b.
+    '''
+    flat = np.concatenate([X[:, i].astype(np.int64) * size + X[:, j] for i, j in pairs])
+    return np.bincount(flat, minlength=size * size).reshape(size, size)
+
+
+class PickStats:
+    '''
+    Comptages des picks construits hors ligne à partir du corpus de matchs :
+    - slot_counts (10, n) : héros pickés à chaque slot du draft
+    - ally (n, n) : héros pickés dans la même équipe
+    - enemy (n, n) : héros pickés dans l'équipe adverse (contre-picks)
+    - transitions (10, n, n) : héros pické au slot s sachant le héros du slot s - 1
+    Les comptages sont additifs : update ajoute de nouveaux matchs sans tout recalculer.
+    Les index sont ceux du vocabulaire de prepare_data (index 0 = padding, jamais compté).
+    Le vocabulaire ne fait que quelques centaines de héros, les matrices sont donc gardées denses.
+    param codes: vocabulaire des codes de héros
+    '''
+
+    def __init__(self, codes=None):
+        self.codes = list(codes) if codes else [PAD_CODE]
+        size = len(self.codes)
+        self.slot_counts = np.zeros((len(PICK_COLUMNS), size), dtype=np.int64)
+        self.ally = np.zeros((size, size), dtype=np.int64)
+        self.enemy = np.zeros((size, size), dtype=np.int64)
+        self.transitions = np.zeros((len(PICK_COLUMNS), size, size), dtype=np.int64)
+        self.n_battles = 0
+        self.last_id = 0
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            stats = cls(data["codes"].tolist())
+            for name in ("slot_counts", "ally", "enemy", "transitions"):
+                setattr(stats, name, data[name])
+            stats.n_battles = int(data["n_battles"])
+            stats.last_id = int(data["last_id"])
+        return stats
+
+    def save(self, path):
+        np.savez_compressed(
+            path, codes=np.array(self.codes), slot_counts=self.slot_counts, ally=self.ally, enemy=self.enemy,
+            transitions=self.transitions, n_battles=self.n_battles, last_id=self.last_id
+        )
+
+    def _grow(self, size):
+        old = len(self.codes)
+        if size <= old:
+            return
+        pad = size - old
+        self.slot_counts = np.pad(self.slot_counts, ((0, 0), (0, pad)))
+        self.ally = np.pad(self.ally, ((0, pad), (0, pad)))
+        self.enemy = np.pad(self.enemy, ((0, pad), (0, pad)))
+        self.transitions = np.pad(self.transitions, ((0, 0), (0, pad), (0, pad)))
+
+    def update(self, df):
+        '''
+        Ajoute les matchs d'un DataFrame retourné par load_and_prepare_data.
+        Les nouveaux héros sont ajoutés à la fin du vocabulaire.
+        param df: matchs dans l'ordre de draft
+        '''
+        X, _, codes = encode(df, self.codes)
+        self._grow(len(codes))
+        self.codes = codes
+        size = len(codes)
+
+        for slot in range(len(PICK_COLUMNS)):
+            self.slot_counts[slot] += np.bincount(X[:, slot], minlength=size)
+        same_team = [(i, j) for team in (FIRST_PICK_SLOTS, SECOND_PICK_SLOTS) for i in team for j in team if i != j]
+        self.ally += _pair_counts(X, same_team, size)
+        opposite = [(i, j) for i in FIRST_PICK_SLOTS for j in SECOND_PICK_SLOTS]
+        opposite += [(j, i) for i, j in opposite]
+        self.enemy += _pair_counts(X, opposite, size)
+        for slot in range(1, len(PICK_COLUMNS)):
+            self.transitions[slot] += _pair_counts(X, [(slot - 1, slot)], size)
+
+        # l'index 0 (padding) n'est jamais un vrai pick
+        self.slot_counts[:, 0] = 0
+        self.n_battles += len(X)
+
+
+def build_pick_stats(data_path, stats_path="data/pick_stats.npz", incremental=True):
+    '''
+    Construit (ou met à jour) les statistiques de picks et les sauvegarde.
+    Avec un BattleStore (.sqlite) et incremental=True, seuls les matchs ajoutés depuis
+    la dernière construction sont lus.
+    param data_path: BattleStore SQLite ou fichier JSON de matchs
+    param stats_path: fichier .npz lu par l'API
+    param incremental: repart des statistiques existantes
+    return: PickStats
+    '''
+    stats = PickStats.load(stats_path) if incremental and Path(stats_path).exists() else PickStats()
+    if str(data_path).endswith(".sqlite"):
+        with BattleStore(data_path) as store:
+            last_id = store.last_id()
+        if last_id > stats.last_id:
+            stats.update(load_and_prepare_data(data_path, since_id=stats.last_id, until_id=last_id))
+        stats.last_id = last_id
+    else:
+        # un fichier JSON n'a pas d'id de match : il est toujours relu entièrement
+        stats = PickStats()
+        stats.update(load_and_prepare_data(data_path))
+    stats.save(stats_path)
+    print(f"Pick statistics over {stats.n_battles} battles and {len(stats.codes) - 1} heroes saved in {stats_path}.")
+    return stats
+
+
+if __name__ == "__main__":
+    data_path = "data/battle_data.sqlite" if Path("data/battle_data.sqlite").exists() else "data/battle_data.json"
+    build_pick_stats(data_path, "data/pick_stats.npz")
@@ -1,98 +1,253 @@
 import json
+import os
 import pandas as pd
 import numpy as np
 from gensim.models import Word2Vec
 from pathlib import Path
+from battle_store import BattleStore
+from draft_order import DRAFT_ORDERS
 
 
-def load_and_prepare_data(json_path: str):
+PAD_CODE = "<pad>"
+PICK_COLUMNS = ["pick_1", "pick_2", "pick_3", "pick_4", "pick_5", "pick_6", "pick_7", "pick_8", "pick_9", "pick_10"]
+
+
+def iter_battles(json_path: str, chunk_size: int = 1 << 20):
+    '''
+    Lit les matchs un par un depuis un fichier JSON (liste de matchs ou un match par ligne)
+    sans charger tout le fichier en mémoire.
+    param json_path: chemin vers le fichier de matchs
+    param chunk_size: taille des blocs lus sur le disque
+    return: générateur de dictionnaires de match
+    '''
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
     with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    df = pd.DataFrame(columns=["pick_1", "pick_2", "pick_3", "pick_4", "pick_5", "pick_6", "pick_7", "pick_8", "pick_9", "pick_10", "result"])
+        while True:
+            # sauter les séparateurs entre deux matchs
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos < len(buffer):
+                try:
+                    match, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # match coupé en fin de bloc : il faut lire la suite
+                    if eof:
+                        raise
+                else:
+                    yield match
+                    continue
+            elif eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def load_and_prepare_data(json_path: str, streaming: bool = True, since_id: int = 0, until_id: int = None,
+                          seasons=None, worlds=None):
+    '''
+    Charge les matchs et les met dans l'ordre de draft (10 picks + résultat du first pick).
+    param json_path: chemin vers le fichier de matchs, vers le BattleStore SQLite (.sqlite) du crawler,
+                     ou vers le dossier du FeatureStore (feature_store.py)
+    param streaming: lit les matchs un par un au lieu de charger tout le fichier avec json.load
+    param since_id: BattleStore uniquement, ne lit que les matchs ajoutés après cet id
+    param until_id: BattleStore uniquement, ne lit que les matchs jusqu'à cet id inclus
+    param seasons: FeatureStore uniquement, saisons à garder (par défaut toutes)
+    param worlds: FeatureStore uniquement, serveurs à garder (par défaut tous)
+    return: DataFrame avec les colonnes pick_1..pick_10 et result
+    '''
+    if Path(json_path).is_dir():
+        # seules les partitions et les colonnes demandées sont lues
+        from feature_store import FeatureStore
+        df = FeatureStore(json_path).to_frame(seasons, worlds)
+        print(f"Data loaded with {len(df)} matches.")
+        return df
+
+    store = None
+    if str(json_path).endswith(".sqlite"):
+        store = BattleStore(json_path)
+        data = store.iter_battles(since_id, until_id)
+    elif streaming:
+        data = iter_battles(json_path)
+    else:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    # colonnes préallouées, agrandies par doublement (coût amorti linéaire)
+    capacity = 1024
+    picks = np.empty((capacity, len(PICK_COLUMNS)), dtype=object)
+    results = np.empty(capacity, dtype=np.int64)
+    n = 0
     for match in data:
-        if match["first_pick"] == "my_team":
-            newListe = []
-            # picks alternés selon l'ordre de draft
-            order = [
-                ("my_team", 0), ("enemy_team", 0),
-                ("enemy_team", 1), ("my_team", 1),
-                ("my_team", 2), ("enemy_team", 2),
-                ("enemy_team", 3), ("my_team", 3),
-                ("my_team", 4), ("enemy_team", 4)
-            ]
-            for team, idx in order:
-                newListe.append(match[team][idx]["hero_code"])
-            
-            newListe.append(1 if match["winner"] == match["first_pick"] else 0)
-            df.loc[len(df)] = newListe
-        else:
-            newListe = []
-            order = [
-                ("enemy_team", 0), ("my_team", 0),
-                ("my_team", 1), ("enemy_team", 1),
-                ("enemy_team", 2), ("my_team", 2),
-                ("my_team", 3), ("enemy_team", 3),
-                ("enemy_team", 4), ("my_team", 4)
-            ]
-            for team, idx in order:
-                newListe.append(match[team][idx]["hero_code"])
-            
-            newListe.append(1 if match["winner"] == match["first_pick"] else 0)
-            df.loc[len(df)] = newListe
+        if n == capacity:
+            capacity *= 2
+            picks = np.resize(picks, (capacity, len(PICK_COLUMNS)))
+            results = np.resize(results, capacity)
+
+        first_pick = match["first_pick"]
+        order = DRAFT_ORDERS["my_team" if first_pick == "my_team" else "enemy_team"]
+        row = picks[n]
+        for slot, (team, idx) in enumerate(order):
+            row[slot] = match[team][idx]["hero_code"]
+        results[n] = 1 if match["winner"] == first_pick else 0
+        n += 1
+    if store is not None:
+        store.close()
+
+    df = pd.DataFrame(picks[:n], columns=PICK_COLUMNS)
+    df["result"] = results[:n]
     print(f"Data loaded with {len(df)} matches.")
     print(df.head())
     return df
 
 
-def encode(df, vector_size=50):
-    # 1. Garder uniquement les colonnes pick_*
-    picks = df.drop(columns=["result"])
-
-    # 2. Transformer chaque ligne en liste de picks
-    sentences = picks.values.tolist()
+def train_word2vec(df, vector_size=50):
+    '''
+    Entraîne le modèle Word2Vec sur l'ensemble des picks.
+    param df: DataFrame retourné par load_and_prepare_data
+    param vector_size: dimension des embeddings
+    return: modèle Word2Vec entraîné
+    '''
+    # 1. Garder uniquement les colonnes pick_*, une ligne = une phrase
+    sentences = df[PICK_COLUMNS].values.tolist()
 
-    # 3. Entraîner le modèle Word2Vec sur l'ensemble des picks
-    model = Word2Vec(
+    # 2. Entraîner le modèle Word2Vec sur l'ensemble des picks
+    return Word2Vec(
         sentences,
         vector_size=vector_size,
         window=5,
         min_count=1,
         sg=1,
-        epochs=20
+        epochs=20,
+        workers=os.cpu_count() or 1
     )
 
-    # 4. Transformer chaque pick en vecteur
-    def get_pick_vectors(row):
-        vectors = []
-        for p in row:
-            if p in model.wv:
-                vectors.append(model.wv[p])
-            else:
-                vectors.append(np.zeros(vector_size))
-        return np.array(vectors)  # shape (10, vector_size)
-
-    # 5. Appliquer à tout le DataFrame
-    X = np.stack(picks.apply(get_pick_vectors, axis=1).values)
+
+def update_word2vec(model, df, anchor=1.0, epochs=20):
+    '''
+    Met à jour un modèle Word2Vec existant avec de nouveaux matchs, sans repartir de zéro.
+    Les nouveaux héros sont ajoutés au vocabulaire ; les vecteurs des héros déjà connus sont
+    gelés (anchor=1.0) ou seulement freinés (0 < anchor < 1) pour que modele2 reste valide.
+    param model: modèle Word2Vec chargé (word2vec_16.model ou word2vec_64.model)
+    param df: DataFrame des nouveaux matchs uniquement
+    param anchor: 1.0 gèle les héros connus, 0.0 les laisse apprendre librement
+    param epochs: nombre d'epochs sur les nouveaux matchs
+    return: le modèle mis à jour
+    '''
+    sentences = df[PICK_COLUMNS].values.tolist()
+    if not sentences:
+        return model
+    known = list(model.wv.key_to_index.values())
+    model.build_vocab(sentences, update=True)
+
+    # vectors_lockf multiplie les mises à jour de chaque vecteur : 0 gèle, 1 laisse libre
+    lockf = np.ones(len(model.wv), dtype=np.float32)
+    lockf[known] = 1.0 - anchor
+    model.wv.vectors_lockf = lockf
+    model.workers = os.cpu_count() or 1
+    model.train(sentences, total_examples=len(sentences), epochs=epochs)
+    return model
+
+
+def refresh_word2vec(store_path, model_path, vector_size=16, anchor=1.0):
+    '''
+    Entraîne le modèle Word2Vec du BattleStore, ou le met à jour avec les seuls matchs ajoutés
+    depuis le dernier entraînement (l'id du dernier match lu est gardé dans le modèle).
+    param store_path: BattleStore SQLite du crawler
+    param model_path: modèle Word2Vec à créer ou à mettre à jour
+    param vector_size: dimension des embeddings d'un nouveau modèle
+    param anchor: voir update_word2vec
+    return: modèle Word2Vec
+    '''
+    with BattleStore(store_path) as store:
+        last_id = store.last_id()
+    if Path(model_path).exists():
+        model = Word2Vec.load(str(model_path))
+        since_id = getattr(model, "last_battle_id", 0)
+        if since_id < last_id:
+            model = update_word2vec(model, load_and_prepare_data(store_path, since_id=since_id, until_id=last_id), anchor)
+    else:
+        model = train_word2vec(load_and_prepare_data(store_path, until_id=last_id), vector_size)
+    model.last_battle_id = last_id
+    return model
+
+
+def build_vocab(df, vocab=None):
+    '''
+    Construit le vocabulaire des codes de héros (l'index 0 est réservé au padding).
+    Un vocabulaire existant est complété par la fin pour que les index déjà attribués ne bougent pas.
+    param df: DataFrame retourné par load_and_prepare_data
+    param vocab: vocabulaire existant à compléter
+    return: liste des codes, la position d'un code est son index
+    '''
+    vocab = list(vocab) if vocab else [PAD_CODE]
+    known = set(vocab)
+    codes = pd.unique(df[PICK_COLUMNS].values.ravel())
+    vocab.extend(sorted(code for code in codes if code not in known))
+    if len(vocab) > np.iinfo(np.int16).max:
+        raise ValueError(f"Vocabulary too large for int16 indices: {len(vocab)} codes")
+    return vocab
+
+
+def encode(df, vocab=None):
+    '''
+    Code chaque pick par l'index du héros dans le vocabulaire.
+    Les embeddings ne sont plus stockés : ils sont lus dans wv.vectors au moment de l'entraînement,
+    ce qui permet d'utiliser le même corpus avec word2vec_16.model ou word2vec_64.model.
+    param df: DataFrame retourné par load_and_prepare_data
+    param vocab: vocabulaire existant (complété si de nouveaux héros apparaissent)
+    return: X (n, 10) int16, y (n,), vocabulaire
+    '''
+    vocab = build_vocab(df, vocab)
+    index = {code: i for i, code in enumerate(vocab)}
+
+    # un seul passage Python sur les codes distincts, le reste est vectorisé
+    codes, inverse = np.unique(df[PICK_COLUMNS].to_numpy(dtype=object).astype(str), return_inverse=True)
+    lookup = np.array([index[code] for code in codes], dtype=np.int16)
+    X = lookup[inverse].reshape(len(df), len(PICK_COLUMNS))
     y = df["result"].values  # ou autre cible selon ton objectif
 
-    return X, y, model
+    return X, y, vocab
+
+
+def save_vocab(vocab, json_path):
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, indent=2)
+
+
+def load_vocab(json_path):
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 
 if __name__ == "__main__":
     print('-'*10)
     print(Path(__file__))
     print('-'*10)
-    df = load_and_prepare_data("data/battle_data.json")
+    # le BattleStore du crawler s'il existe, sinon l'ancien export JSON
+    data_path = "data/battle_data.sqlite" if Path("data/battle_data.sqlite").exists() else "data/battle_data.json"
+    df = load_and_prepare_data(data_path)
 
-    X, y, model = encode(df, vector_size=16)
+    if data_path.endswith(".sqlite"):
+        # embeddings mis à jour avec les nouveaux matchs seulement, les héros connus ne bougent pas
+        model = refresh_word2vec(data_path, "data/word2vec_16.model", vector_size=16)
+    else:
+        model = train_word2vec(df, vector_size=16)
+    vocab = load_vocab("data/vocab.json") if Path("data/vocab.json").exists() else None
+    X, y, vocab = encode(df, vocab)
 
-    print(X.shape)  # (9490, 10, 64)
+    print(X.shape)  # (9490, 10)
     print(X[0])    # Premier match encodé
     print(y)       # Labels
 
-    # Sauvegarde X et y
-    np.save("data/X.npy", X)
+    # Sauvegarde X (index des héros), le vocabulaire et y
+    np.save("data/X_idx.npy", X)
+    save_vocab(vocab, "data/vocab.json")
     np.save("data/y.npy", y)
 
     # Sauvegarde le modèle Word2Vec
-    model.save("data/word2vec_16.model")
\ No newline at end of file
+    model.save("data/word2vec_16.model")
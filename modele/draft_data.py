@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def embedding_table(vocab, word2vec_model):
+    '''
+    Construit la table d'embeddings alignée sur le vocabulaire de prepare_data.
+    La ligne 0 (padding) et les héros absents du modèle Word2Vec restent à zéro.
+    param vocab: liste des codes de héros (la position est l'index utilisé dans X_idx.npy)
+    param word2vec_model: modèle Word2Vec (16 ou 64 dimensions)
+    return: tableau float32 (len(vocab), vector_size)
+    '''
+    wv = word2vec_model.wv
+    table = np.zeros((len(vocab), wv.vector_size), dtype=np.float32)
+    rows = [i for i, code in enumerate(vocab) if i > 0 and code in wv.key_to_index]
+    table[rows] = wv.vectors[[wv.key_to_index[vocab[i]] for i in rows]]
+    return table
+
+
+def expand_prefixes(X_idx, maxlen=10):
+    '''
+    Construit tous les couples (préfixe du draft -> pick suivant) sans boucle Python.
+    Les préfixes restent des index de héros, remplis à gauche par l'index 0 (padding),
+    dans le même ordre que l'ancienne double boucle + pad_sequences.
+    param X_idx: drafts codés (n, longueur) par prepare_data
+    param maxlen: longueur des préfixes après remplissage
+    return: préfixes (n * (longueur - 1), maxlen), pick suivant (n * (longueur - 1),)
+    '''
+    n, length = X_idx.shape
+    padded = np.concatenate([np.zeros((n, maxlen - 1), dtype=X_idx.dtype), X_idx], axis=1)
+    # la fenêtre s couvre les maxlen dernières positions du préfixe de longueur s + 1
+    windows = np.lib.stride_tricks.sliding_window_view(padded, maxlen, axis=1)[:, :length - 1]
+    prefixes = windows.reshape(-1, maxlen)
+    targets = X_idx[:, 1:].reshape(-1)
+    return prefixes, targets
+
+
+def split_drafts(n_drafts, test_size=0.2, seed=42):
+    '''
+    Découpage entraînement / validation par match : tous les préfixes d'un même draft restent
+    du même côté, sinon la validation contient des préfixes de drafts vus à l'entraînement.
+    Partagé par modele2.py, win_model.py, sweep.py et evaluate.py, qui valident donc sur les mêmes matchs.
+    param n_drafts: nombre de drafts (lignes de X_idx)
+    param test_size: part des drafts gardée pour la validation
+    param seed: graine du découpage
+    return: index des drafts d'entraînement, index des drafts de validation
+    '''
+    order = np.random.default_rng(seed).permutation(n_drafts)
+    n_val = int(np.ceil(n_drafts * test_size))
+    return np.sort(order[n_val:]), np.sort(order[:n_val])
@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from export import load_inference_artifact
+from draft_data import expand_prefixes, split_drafts
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "collect_process_data"))
+from draft_order import FIRST_PICK_SLOTS
+
+TOP_K = (1, 5, 10)
+
+
+def target_ranks(predict, prefixes, targets, table, hero_vectors, hero_rows, exclude_picked=True, batch_size=8192):
+    '''
+    Rang du vrai pick parmi tous les héros pour chaque préfixe, par batchs :
+    une passe avant puis un seul produit matriciel avec la table normalisée des héros.
+    param predict: passe avant (batch (n, maxlen, dim) -> vecteurs prédits (n, dim))
+    param prefixes: préfixes codés (n, maxlen), 0 = padding
+    param targets: index du vrai pick (n,)
+    param table: embeddings alignés sur le vocabulaire (len(vocab), dim), entrée du modèle
+    param hero_vectors: embeddings des héros classés (ceux de l'artefact, comme dans l'API)
+    param hero_rows: ligne de chaque code du vocabulaire dans hero_vectors (-1 si absent)
+    param exclude_picked: les héros déjà dans le préfixe ne sont pas classés, comme dans l'API
+    param batch_size: nombre de préfixes par batch
+    return: rangs (n,) à partir de 1, inf si le vrai pick n'est pas classable
+    '''
+    normed = hero_vectors / np.maximum(np.linalg.norm(hero_vectors, axis=1, keepdims=True), 1e-12)
+    ranks = np.empty(len(prefixes), dtype=np.float64)
+    for start in range(0, len(prefixes), batch_size):
+        batch = np.asarray(prefixes[start:start + batch_size])
+        predicted = predict(table[batch])
+        predicted /= np.maximum(np.linalg.norm(predicted, axis=1, keepdims=True), 1e-12)
+        scores = predicted @ normed.T
+        if exclude_picked:
+            rows = hero_rows[batch]
+            picked = (batch > 0) & (rows >= 0)
+            scores[np.nonzero(picked)[0], rows[picked]] = -np.inf
+        target_rows = hero_rows[np.asarray(targets[start:start + batch_size])]
+        known = target_rows >= 0
+        target_scores = scores[np.arange(len(batch)), np.where(known, target_rows, 0)]
+        ranks[start:start + len(batch)] = np.where(known, (scores > target_scores[:, None]).sum(axis=1) + 1, np.inf)
+    return ranks
+
+
+def summarize(ranks):
+    if len(ranks) == 0:
+        return {"prefixes": 0}
+    summary = {"prefixes": int(len(ranks))}
+    for k in TOP_K:
+        summary[f"top{k}"] = float((ranks <= k).mean())
+    summary["mrr"] = float((1 / ranks).mean())
+    return summary
+
+
+def evaluate(predict, prefixes, targets, table, hero_vectors, hero_rows, exclude_picked=True, batch_size=8192):
+    '''
+    Taux de bonnes réponses top-1/5/10 et MRR, au total, par position du pick et par camp.
+    param prefixes, targets: préfixes de validation et vrais picks (voir target_ranks)
+    return: dictionnaire des métriques
+    '''
+    start = time.perf_counter()
+    ranks = target_ranks(predict, prefixes, targets, table, hero_vectors, hero_rows, exclude_picked, batch_size)
+    elapsed = time.perf_counter() - start
+
+    # le slot prédit est la longueur du préfixe (sans padding)
+    slots = (np.asarray(prefixes) > 0).sum(axis=1)
+    first_pick = np.isin(slots, FIRST_PICK_SLOTS)
+    return {
+        "overall": summarize(ranks),
+        "by_position": {int(slot) + 1: summarize(ranks[slots == slot]) for slot in np.unique(slots)},
+        "by_side": {"first_pick": summarize(ranks[first_pick]), "second_pick": summarize(ranks[~first_pick])},
+        "seconds": elapsed,
+        "prefixes_per_s": len(ranks) / elapsed if elapsed else 0.0
+    }
+
+
+def popularity_baseline(train_targets, targets, hero_rows):
+    '''
+    Référence naïve : les héros classés par nombre de picks à l'entraînement, quel que soit le draft.
+    '''
+    counts = np.bincount(np.asarray(train_targets), minlength=len(hero_rows)).astype(np.float64)
+    counts[hero_rows < 0] = -1
+    counts[0] = -1
+    target_counts = counts[np.asarray(targets)]
+    ranks = (counts[None, :] > target_counts[:, None]).sum(axis=1) + 1.0
+    return summarize(np.where(target_counts >= 0, ranks, np.inf))
+
+
+def check_gate(metrics, min_top5=None, min_mrr=None):
+    failures = []
+    if min_top5 is not None and metrics["overall"]["top5"] < min_top5:
+        failures.append(f"top5 {metrics['overall']['top5']:.4f} < {min_top5}")
+    if min_mrr is not None and metrics["overall"]["mrr"] < min_mrr:
+        failures.append(f"mrr {metrics['overall']['mrr']:.4f} < {min_mrr}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline next-pick evaluation of the exported model (run from the repository root).")
+    parser.add_argument("--artifact", default="data/modele2.npz")
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--keep-picked", action="store_true", help="also rank heroes already in the draft")
+    parser.add_argument("--min-top5", type=float, default=None, help="deploy gate: minimum overall top-5 hit rate")
+    parser.add_argument("--min-mrr", type=float, default=None, help="deploy gate: minimum overall MRR")
+    parser.add_argument("--output", default="data/evaluation.json")
+    args = parser.parse_args()
+
+    X_idx = np.load("data/X_idx.npy")
+    with open("data/vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    predict, hero_codes, hero_vectors = load_inference_artifact(args.artifact)
+
+    # même découpage par match que modele2.py : aucun préfixe des drafts de validation n'a servi à l'entraînement
+    train_rows, val_rows = split_drafts(len(X_idx))
+    _, train_targets = expand_prefixes(X_idx[train_rows], maxlen=10)
+    val_prefixes, val_targets = expand_prefixes(X_idx[val_rows], maxlen=10)
+
+    code_rows = {code: i for i, code in enumerate(hero_codes)}
+    hero_rows = np.array([code_rows.get(code, -1) if i > 0 else -1 for i, code in enumerate(vocab)])
+    table = np.zeros((len(vocab), hero_vectors.shape[1]), dtype=np.float32)
+    table[hero_rows >= 0] = hero_vectors[hero_rows[hero_rows >= 0]]
+
+    metrics = evaluate(predict, val_prefixes, val_targets, table, hero_vectors, hero_rows,
+                       not args.keep_picked, args.batch_size)
+    metrics["popularity_baseline"] = popularity_baseline(train_targets, val_targets, hero_rows)
+    metrics["artifact"] = args.artifact
+    failures = check_gate(metrics, args.min_top5, args.min_mrr)
+    metrics["gate"] = {"min_top5": args.min_top5, "min_mrr": args.min_mrr, "passed": not failures}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+
+    overall = metrics["overall"]
+    print(f"{overall['prefixes']} prefixes in {metrics['seconds']:.2f}s: "
+          + ", ".join(f"top{k} {overall[f'top{k}']:.4f}" for k in TOP_K) + f", MRR {overall['mrr']:.4f}")
+    for failure in failures:
+        print(f"GATE FAILED: {failure}")
+    sys.exit(1 if failures else 0)
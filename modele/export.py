@@ -0,0 +1,92 @@
+import numpy as np
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+def numpy_forward(kernels, biases, activations, batch):
+    '''
+    Passe avant en NumPy d'un modèle Flatten + Dense (les Dropout sont inactifs en inférence).
+    param kernels: poids des couches Dense
+    param biases: biais des couches Dense
+    param activations: nom de l'activation de chaque couche Dense
+    param batch: entrées (batch, maxlen, dim)
+    return: sorties (batch, units)
+    '''
+    x = np.asarray(batch, dtype=np.float32).reshape(len(batch), -1)
+    for kernel, bias, activation in zip(kernels, biases, activations):
+        x = ACTIVATIONS[activation](x @ kernel + bias)
+    return x
+
+
+def export_inference_artifact(model, word2vec_model, npz_path="data/modele2.npz", check_samples=256):
+    '''
+    Écrit les poids du modèle Keras et les vecteurs Word2Vec dans un seul fichier .npz,
+    chargé par l'API sans TensorFlow ni gensim. Le résultat de la passe avant NumPy est
+    comparé à model.predict avant d'écrire le fichier.
+    param model: modèle Keras construit par build_model
+    param word2vec_model: modèle Word2Vec utilisé pour l'entraînement
+    param npz_path: chemin du fichier exporté
+    param check_samples: nombre d'entrées aléatoires utilisées pour la vérification
+    '''
+    # TensorFlow n'est importé que pour exporter : numpy_forward reste utilisable sans lui (API, evaluate.py)
+    from tensorflow.keras.layers import Dense, Flatten, Dropout
+
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        if isinstance(layer, Dense):
+            kernel, bias = layer.get_weights()
+            kernels.append(kernel.astype(np.float32))
+            biases.append(bias.astype(np.float32))
+            activations.append(layer.get_config()["activation"])
+        elif not isinstance(layer, (Flatten, Dropout)):
+            raise ValueError(f"Layer not supported by the NumPy runtime: {layer.__class__.__name__}")
+    unknown = set(activations) - set(ACTIVATIONS)
+    if unknown:
+        raise ValueError(f"Activation not supported by the NumPy runtime: {', '.join(sorted(unknown))}")
+
+    input_shape = tuple(model.input_shape[1:])
+    sample = np.random.default_rng(0).normal(size=(check_samples, *input_shape)).astype(np.float32)
+    expected = model.predict(sample, verbose=0)
+    got = numpy_forward(kernels, biases, activations, sample)
+    if not np.allclose(expected, got, rtol=1e-4, atol=1e-5):
+        raise ValueError(f"NumPy forward pass differs from Keras (max abs diff {np.abs(expected - got).max():.2e})")
+
+    wv = word2vec_model.wv
+    arrays = {"activations": np.array(activations), "input_shape": np.array(input_shape)}
+    for i, (kernel, bias) in enumerate(zip(kernels, biases)):
+        arrays[f"kernel_{i}"] = kernel
+        arrays[f"bias_{i}"] = bias
+    arrays["hero_codes"] = np.array(wv.index_to_key)
+    arrays["hero_vectors"] = wv.vectors.astype(np.float32)
+    np.savez(npz_path, **arrays)
+    print(f"Exported {len(kernels)} Dense layers and {len(wv.index_to_key)} hero vectors to {npz_path}.")
+
+
+def load_inference_artifact(npz_path="data/modele2.npz"):
+    '''
+    Relit un artefact écrit par export_inference_artifact.
+    param npz_path: chemin du fichier exporté
+    return: fonction de passe avant (batch -> vecteurs prédits), codes des héros, vecteurs des héros
+    '''
+    with np.load(npz_path) as artifact:
+        activations = artifact["activations"].tolist()
+        kernels = [artifact[f"kernel_{i}"] for i in range(len(activations))]
+        biases = [artifact[f"bias_{i}"] for i in range(len(activations))]
+        hero_codes = artifact["hero_codes"].tolist()
+        hero_vectors = artifact["hero_vectors"]
+    return (lambda batch: numpy_forward(kernels, biases, activations, batch)), hero_codes, hero_vectors
+
+
+if __name__ == "__main__":
+    from tensorflow.keras.models import load_model
+    from gensim.models import Word2Vec
+
+    model = load_model("data/modele2.keras")
+    word2vec_model = Word2Vec.load("data/word2vec_16.model")
+    export_inference_artifact(model, word2vec_model, "data/modele2.npz")
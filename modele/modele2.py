@@ -1,66 +1,125 @@
+import argparse
 import json
+import sys
+from pathlib import Path
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Flatten, Dropout
-from sklearn.model_selection import train_test_split
+from tensorflow.keras.layers import Dense, Flatten, Dropout, GRU, Input
 from tensorflow.keras.utils import to_categorical
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-
-
-
-def build_model(input_shape=(10, 64)):
-    model = Sequential([
-        Flatten(input_shape=input_shape),
-        Dense(16, activation='relu'),
-        Dropout(0.3),
-        Dense(16, activation='relu'),
-        Dropout(0.2),
-        Dense(16, activation='linear')  
-    ])
+from gensim.models import Word2Vec
+from export import export_inference_artifact
+from draft_data import embedding_table, expand_prefixes, split_drafts
+
+
+
+def build_model(input_shape=(10, 64), hidden=(16, 16), dropout=(0.3, 0.2), variant="mlp"):
+    '''
+    Modèle qui prédit l'embedding du prochain pick à partir du draft (préfixe rempli à gauche).
+    Les valeurs par défaut sont celles du modèle servi par l'API.
+    param input_shape: (longueur du draft, dimension des embeddings)
+    param hidden: taille des couches cachées
+    param dropout: dropout après chaque couche cachée (un seul nombre ou un par couche)
+    param variant: "mlp" (draft aplati) ou "gru" (la première couche lit le draft pick par pick)
+    return: modèle Keras compilé
+    '''
+    if not isinstance(dropout, (list, tuple)):
+        dropout = (dropout,) * len(hidden)
+    if variant == "mlp":
+        layers = [Flatten()]
+        dense = hidden
+    elif variant == "gru":
+        # l'export NumPy de l'API ne gère que les couches Dense : variante réservée aux essais (modele/sweep.py)
+        layers = [GRU(hidden[0])]
+        dense = hidden[1:]
+        layers.append(Dropout(dropout[0]))
+        dropout = dropout[1:]
+    else:
+        raise ValueError(f"Unknown model variant: {variant}")
+    for units, rate in zip(dense, dropout):
+        layers.append(Dense(units, activation='relu'))
+        layers.append(Dropout(rate))
+    model = Sequential([Input(shape=input_shape), *layers, Dense(input_shape[-1], activation='linear')])
     model.compile(optimizer='adam', loss='mse', metrics=['mae'])
     return model
 
 
+def make_dataset(prefixes, targets, table, batch_size=64, shuffle=True, seed=None, embed_targets=True):
+    '''
+    Pipeline tf.data qui remplace les index par leurs embeddings batch par batch :
+    seule la mémoire d'un batch de vecteurs est allouée pendant l'entraînement.
+    Le pipeline ne mélange que les positions des exemples ; chaque batch est lu dans les tableaux
+    au moment où il est consommé, qui peuvent donc rester ouverts en mémoire partagée (np.load(mmap_mode="r"))
+    sans être copiés dans le processus.
+    param prefixes: préfixes codés (n, maxlen), tableau NumPy ou memmap
+    param targets: index du pick suivant (n,), ou cibles déjà numériques si embed_targets=False
+    param table: table d'embeddings retournée par embedding_table
+    param batch_size: taille des batchs
+    param shuffle: mélange les exemples à chaque epoch
+    param seed: graine du mélange
+    param embed_targets: remplace aussi les cibles par leurs embeddings
+    return: tf.data.Dataset de couples (préfixes (batch, maxlen, dim), cibles (batch, dim))
+    '''
+    table = tf.constant(table, dtype=tf.float32)
+    dtypes = (tf.as_dtype(prefixes.dtype), tf.as_dtype(targets.dtype))
+
+    def gather(indices):
+        return np.asarray(prefixes[indices]), np.asarray(targets[indices])
+
+    def lookup(indices):
+        prefix, target = tf.numpy_function(gather, [indices], dtypes)
+        prefix.set_shape((None, *prefixes.shape[1:]))
+        target.set_shape((None, *targets.shape[1:]))
+        if embed_targets:
+            target = tf.gather(table, tf.cast(target, tf.int32))
+        return tf.gather(table, tf.cast(prefix, tf.int32)), target
+
+    dataset = tf.data.Dataset.range(len(prefixes))
+    if shuffle:
+        dataset = dataset.shuffle(len(prefixes), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(lookup, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
 
-if __name__ == "__main__":
-    # Charger les données préparées
-    X = np.load("data/X.npy")
 
-    X_inputs = []
-    y_outputs = []
-
-    for draft in X:
-        for i in range(1, len(draft)):
-            X_inputs.append(draft[:i])   # séquence de 1 à i éléments
-            y_outputs.append(draft[i])   # prochain pick
-
-    X_inputs = pad_sequences(X_inputs, maxlen=10, padding='pre', dtype='float32')  
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and export the next-pick model (run from the repository root).")
+    parser.add_argument("--seasons", nargs="+", default=None, help="only train on these season codes (reads data/features)")
+    parser.add_argument("--worlds", nargs="+", default=None, help="only train on these world codes (reads data/features)")
+    args = parser.parse_args()
+
+    # Charger les données préparées (index des héros) et les embeddings
+    X_idx = np.load("data/X_idx.npy")
+    with open("data/vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+
+    # pour n'entraîner que sur certaines saisons / certains serveurs, lecture directe du feature store
+    if args.seasons or args.worlds:
+        sys.path.append(str(Path(__file__).resolve().parent.parent / "collect_process_data"))
+        from feature_store import FeatureStore
+        features = FeatureStore("data/features")
+        X_idx = features.encode_picks(features.scan(("picks",), args.seasons, args.worlds)["picks"], vocab)
+        X_idx = X_idx[(X_idx >= 0).all(axis=1)]  # héros absents du vocabulaire de Word2Vec
+    word2vec_model = Word2Vec.load("data/word2vec_16.model")
+    table = embedding_table(vocab, word2vec_model)
+
+    # Split data par match (le même que win_model.py et evaluate.py), puis préfixe de 1 à 9 éléments -> prochain pick
+    train_rows, val_rows = split_drafts(len(X_idx))
+    X_train, y_train = expand_prefixes(X_idx[train_rows], maxlen=10)
+    X_val, y_val = expand_prefixes(X_idx[val_rows], maxlen=10)
 
     accuracies = []
     losses = []
-    print(X_inputs.shape)
-    print(len(y_outputs))
-
-
-    # Split data
-    y_outputs = np.array(y_outputs, dtype=np.float32)
-    X_inputs = np.array(X_inputs, dtype=np.float32)
-
-    X_train, X_val, y_train, y_val = train_test_split(X_inputs, y_outputs, test_size=0.2, random_state=i)
     print("X_train:", X_train.shape)
-    print("y_train:", np.array(y_train).shape)
-    print("type(y_train):", type(y_train))
-    print("type(y_train[0]):", type(y_train[0]))
+    print("y_train:", y_train.shape)
 
+    train_dataset = make_dataset(X_train, y_train, table, batch_size=64, shuffle=True)
+    val_dataset = make_dataset(X_val, y_val, table, batch_size=64, shuffle=False)
 
-    model = build_model(input_shape=(X_inputs.shape[1], X_inputs.shape[2]))
-    history = model.fit(X_train, y_train, epochs=30, batch_size=64, validation_data=(X_val, y_val), verbose=1)
+    model = build_model(input_shape=(X_train.shape[1], table.shape[1]))
+    history = model.fit(train_dataset, epochs=30, validation_data=val_dataset, verbose=1)
 
-    # Sauvegarde le modèle
+    # Sauvegarde le modèle, et sa version NumPy pour l'API
     model.save("data/modele2.keras")
-
-
-
-
+    export_inference_artifact(model, word2vec_model, "data/modele2.npz")
@@ -0,0 +1,155 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+
+def prepare_arrays(out_dir, X_idx, vocab, word2vec_paths, test_size=0.2, seed=42):
+    '''
+    Prépare une seule fois les données de la recherche d'hyperparamètres dans des fichiers .npy
+    ouverts en mémoire partagée (np.load(mmap_mode="r")) par tous les processus :
+    préfixes et cibles (index des héros) d'entraînement et de validation, et une table
+    d'embeddings par dimension.
+    param out_dir: dossier des tableaux
+    param X_idx: drafts codés par prepare_data
+    param vocab: vocabulaire de prepare_data
+    param word2vec_paths: {dimension: chemin du modèle Word2Vec}
+    param test_size: part des matchs gardée pour la validation
+    param seed: graine du découpage par match (le même que modele2.py)
+    '''
+    from gensim.models import Word2Vec
+    from draft_data import embedding_table, expand_prefixes, split_drafts
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    train_rows, val_rows = split_drafts(len(X_idx), test_size, seed)
+    arrays = dict(zip(("train_prefixes", "train_targets"), expand_prefixes(X_idx[train_rows], maxlen=10)))
+    arrays.update(zip(("val_prefixes", "val_targets"), expand_prefixes(X_idx[val_rows], maxlen=10)))
+    for vector_size, path in word2vec_paths.items():
+        arrays[f"table_{vector_size}"] = embedding_table(vocab, Word2Vec.load(str(path)))
+    for name, array in arrays.items():
+        mapped = np.lib.format.open_memmap(out_dir / f"{name}.npy", mode="w+", dtype=array.dtype, shape=array.shape)
+        mapped[:] = array
+        mapped.flush()
+        del mapped
+    print(f"Prepared {len(arrays['train_prefixes'])} training and {len(arrays['val_prefixes'])} validation prefixes in {out_dir}.")
+
+
+def _init_worker(threads):
+    # à appeler avant l'import de TensorFlow dans le processus
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                 "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[name] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+
+def run_config(data_dir, config):
+    '''
+    Entraîne et évalue une configuration sur les tableaux de prepare_arrays.
+    En plus de la perte de validation (qui dépend de la dimension des embeddings), le taux de
+    bonnes réponses top-1 (héros le plus proche en cosinus = vrai pick) permet de comparer
+    des configurations de dimensions différentes.
+    param data_dir: dossier des tableaux
+    param config: dictionnaire (hidden, dropout, vector_size, variant, batch_size, epochs, seed)
+    return: config complétée des métriques
+    '''
+    import tensorflow as tf
+    from modele2 import build_model, make_dataset
+
+    data_dir = Path(data_dir)
+    load = lambda name: np.load(data_dir / f"{name}.npy", mmap_mode="r")
+    table = np.asarray(load(f"table_{config['vector_size']}"))
+    train_prefixes, train_targets = load("train_prefixes"), load("train_targets")
+    val_prefixes, val_targets = load("val_prefixes"), load("val_targets")
+
+    tf.keras.utils.set_random_seed(config["seed"])
+    train = make_dataset(train_prefixes, train_targets, table, config["batch_size"], shuffle=True, seed=config["seed"])
+    val = make_dataset(val_prefixes, val_targets, table, config["batch_size"], shuffle=False)
+    model = build_model((train_prefixes.shape[1], table.shape[1]), hidden=tuple(config["hidden"]),
+                        dropout=config["dropout"], variant=config["variant"])
+
+    start = time.perf_counter()
+    history = model.fit(train, epochs=config["epochs"], validation_data=val, verbose=0)
+    train_seconds = time.perf_counter() - start
+
+    predicted = model.predict(make_dataset(val_prefixes, val_targets, table, 1024, shuffle=False), verbose=0)
+    normed = table / np.maximum(np.linalg.norm(table, axis=1, keepdims=True), 1e-12)
+    scores = predicted @ normed.T
+    scores[:, 0] = -np.inf  # le padding n'est jamais un pick
+    hits = np.argmax(scores, axis=1) == np.asarray(val_targets)
+    return {
+        **config,
+        "val_loss": float(history.history["val_loss"][-1]),
+        "val_mae": float(history.history["val_mae"][-1]),
+        "val_top1": float(hits.mean()),
+        "train_seconds": train_seconds,
+        "train_samples_per_s": len(train_prefixes) * config["epochs"] / train_seconds,
+        "params": int(model.count_params())
+    }
+
+
+def make_grid(hidden, dropout, vector_sizes, variants, batch_sizes, epochs, seed=0):
+    return [
+        {"hidden": list(h), "dropout": d, "vector_size": v, "variant": m, "batch_size": b, "epochs": epochs, "seed": seed}
+        for h, d, v, m, b in itertools.product(hidden, dropout, vector_sizes, variants, batch_sizes)
+    ]
+
+
+def sweep(data_dir, grid, workers=None, threads=1):
+    '''
+    Répartit les configurations sur un pool de processus, chacun limité à `threads` threads
+    pour que workers * threads ne dépasse pas le nombre de cœurs.
+    return: classement des configurations (meilleur val_top1 d'abord)
+    '''
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    results = []
+    # "spawn" : TensorFlow ne supporte pas d'être forké après initialisation
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(run_config, str(data_dir), config): config for config in grid}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {**futures[future], "error": str(e)}
+            results.append(result)
+            print(json.dumps(result))
+    return sorted(results, key=lambda r: (-r.get("val_top1", -1), r.get("val_loss", np.inf)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for modele2 (run from the repository root).")
+    parser.add_argument("--data-dir", default="data/sweep")
+    parser.add_argument("--prepare", action="store_true", help="rebuild the memory-mapped arrays")
+    parser.add_argument("--hidden", nargs="+", default=["16,16", "32,16", "64,32"], help="comma-separated layer widths")
+    parser.add_argument("--dropout", nargs="+", type=float, default=[0.2, 0.3])
+    parser.add_argument("--vector-sizes", nargs="+", type=int, default=[16, 64])
+    parser.add_argument("--variants", nargs="+", default=["mlp", "gru"], choices=["mlp", "gru"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[64])
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="TensorFlow threads per process")
+    parser.add_argument("--output", default="data/sweep_leaderboard.json")
+    args = parser.parse_args()
+
+    if args.prepare or not (Path(args.data_dir) / "train_prefixes.npy").exists():
+        with open("data/vocab.json", "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        word2vec_paths = {size: f"data/word2vec_{size}.model" for size in args.vector_sizes}
+        prepare_arrays(args.data_dir, np.load("data/X_idx.npy"), vocab, word2vec_paths)
+
+    hidden = [tuple(int(units) for units in h.split(",")) for h in args.hidden]
+    grid = make_grid(hidden, args.dropout, args.vector_sizes, args.variants, args.batch_sizes, args.epochs)
+    leaderboard = sweep(args.data_dir, grid, args.workers, args.threads)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(leaderboard, f, indent=2)
+    print(f"Leaderboard of {len(leaderboard)} configurations saved in {args.output}.")
@@ -0,0 +1,68 @@
+import json
+import numpy as np
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import Dense, Flatten, Dropout
+from gensim.models import Word2Vec
+from modele2 import make_dataset
+from draft_data import embedding_table, expand_prefixes, split_drafts
+from export import export_inference_artifact
+
+
+
+def build_win_model(input_shape=(10, 16)):
+    '''
+    Modèle qui estime la probabilité de victoire de l'équipe qui a le first pick à partir d'un draft (complet ou partiel).
+    param input_shape: (longueur du draft, dimension des embeddings)
+    return: modèle Keras compilé
+    '''
+    model = Sequential([
+        Flatten(input_shape=input_shape),
+        Dense(32, activation='relu'),
+        Dropout(0.3),
+        Dense(16, activation='relu'),
+        Dropout(0.2),
+        Dense(1, activation='sigmoid')
+    ])
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def expand_win_examples(X_idx, y, maxlen=10):
+    '''
+    Construit les drafts partiels (1 à 10 picks) de chaque match, étiquetés par le résultat du match.
+    param X_idx: drafts codés (n, 10) par prepare_data
+    param y: 1 si l'équipe du first pick a gagné (n,)
+    param maxlen: longueur des drafts après remplissage
+    return: drafts partiels (n * 10, maxlen), étiquettes (n * 10,)
+    '''
+    prefixes, _ = expand_prefixes(X_idx, maxlen=maxlen)
+    drafts = np.concatenate([prefixes, X_idx[:, -maxlen:]])
+    labels = np.concatenate([np.repeat(y, X_idx.shape[1] - 1), y]).astype(np.float32)
+    return drafts, labels
+
+
+
+if __name__ == "__main__":
+    # Charger les données préparées (index des héros), les résultats et les embeddings
+    X_idx = np.load("data/X_idx.npy")
+    y = np.load("data/y.npy")
+    with open("data/vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    word2vec_model = Word2Vec.load("data/word2vec_16.model")
+    table = embedding_table(vocab, word2vec_model)
+
+    # split par match pour que les drafts partiels d'un même match restent du même côté (le même que modele2.py)
+    train_rows, val_rows = split_drafts(len(X_idx))
+    X_train, y_train = expand_win_examples(X_idx[train_rows], y[train_rows])
+    X_val, y_val = expand_win_examples(X_idx[val_rows], y[val_rows])
+    print("X_train:", X_train.shape)
+
+    train_dataset = make_dataset(X_train, y_train, table, batch_size=64, shuffle=True, embed_targets=False)
+    val_dataset = make_dataset(X_val, y_val, table, batch_size=64, shuffle=False, embed_targets=False)
+
+    model = build_win_model(input_shape=(X_train.shape[1], table.shape[1]))
+    history = model.fit(train_dataset, epochs=20, validation_data=val_dataset, verbose=1)
+
+    # Sauvegarde le modèle, et sa version NumPy pour l'API
+    model.save("data/win_model.keras")
+    export_inference_artifact(model, word2vec_model, "data/win_model.npz")